@@ -1,7 +1,7 @@
 import asyncio
 import datetime
 import aiohttp
-from typing import List, Dict, Tuple, Any
+from typing import AsyncIterator, List, Dict, Tuple, Any, Optional
 from infrastructure.rate_limiter import RateLimiter, APIEndpoint, rate_limited
 from infrastructure.decorators.retry_decorator import async_retry
 from core.api.amazon_sp_api_wrapper import AmazonSPAPIWrapper
@@ -16,6 +16,9 @@ FUNCIONALIDAD:
 
 
 class AmazonAPIClient:
+    # Segundos entre páginas de getOrders
+    ORDERS_PAGE_DELAY = 2
+
     def __init__(self):
         self.session = None
         self.rate_limiter = RateLimiter(max_requests=100, window=60)
@@ -29,53 +32,58 @@ class AmazonAPIClient:
         if self.session:
             await self.session.close()
 
-    async def get_orders_paginated(self, date_from: datetime, date_to: datetime,
-                                   markets: List[str]) -> List[dict]:
-        """Obtener órdenes con paginación automática y rate limiting"""
-        all_orders = []
+    async def iter_orders_paginated(self, date_from: datetime, date_to: datetime,
+                                    markets: List[str]) -> AsyncIterator[List[dict]]:
+        """
+        Iterar órdenes página a página según llegan de la API
 
+        No acumula todo el periodo en memoria: cada página se entrega al
+        consumidor en cuanto se recibe. El rate limit de ORDERS se aplica por
+        mercado; cada página se pide con reintentos en _get_orders_page.
+        """
         for market in markets:
-            async with self.rate_limiter:
-                orders = await self._get_orders_for_market(
-                    market, date_from, date_to
-                )
-                all_orders.extend(orders)
+            await self.rate_limiter.acquire(APIEndpoint.ORDERS)
 
-        return all_orders
+            next_token = None
+            while True:
+                orders, next_token = await self._get_orders_page(
+                    market, date_from, date_to, next_token
+                )
+                if orders:
+                    yield orders
+                if not next_token:
+                    break
+                # Misma pausa entre páginas que load_all_pages de sp_api
+                await asyncio.sleep(self.ORDERS_PAGE_DELAY)
 
-    @rate_limited(APIEndpoint.ORDERS)
     @async_retry(max_retries=3, backoff_base=2)
-    async def _get_orders_for_market(self, market: str, date_from: datetime,
-                                     date_to: datetime) -> List[dict]:
-        """
-        Obtener ordenes para un mercado específico
-        Ahora usa el wrapper limpio en lugar de libs/transform.py
+    async def _get_orders_page(self, market: str, date_from: datetime, date_to: datetime,
+                               next_token: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
         """
-        print("#" * 5, "=" * 70)
-        print("#" * 5, " GET ORDERS")
+        Obtener una página de órdenes de un mercado
 
-        # Usar wrapper asíncrono
-        result = await asyncio.to_thread(
-            self.api_wrapper.get_orders,
+        Un reintento repite solo esta página (mismo next_token). Ante un 429
+        se aplica el backoff del rate limiter antes de reintentar.
+
+        Returns:
+            Tupla (órdenes de la página, token de la siguiente o None)
+        """
+        page, success = await asyncio.to_thread(
+            self.api_wrapper.get_orders_page,
             date_from=date_from.isoformat(),
             date_to=date_to.isoformat(),
-            markets=[market]
+            markets=[market],
+            next_token=next_token
         )
 
-        orders, success = result
-
-        if success and orders:
-            return orders
-
-        if success and not orders:
-            return []
+        if success:
+            return page['orders'], page['next_token']
 
         # Error - verificar rate limit
-        if orders and isinstance(orders, list) and len(orders) > 0:
-            if isinstance(orders[0], dict) and orders[0].get('code') == 429:
-                print("#" * 5, " -Rate limit alcanzado")
+        if page.get('code') == 429:
+            await self.rate_limiter.handle_rate_limit_error(APIEndpoint.ORDERS)
 
-        raise Exception("API request failed")
+        raise Exception(f"Error obteniendo página de órdenes para {market}")
 
     @rate_limited(APIEndpoint.ORDER_ITEMS)
     @async_retry(max_retries=3, backoff_base=2)
@@ -215,6 +223,51 @@ class AmazonAPIClient:
 
         return all_sales_data
 
+    async def get_sales_data_bulk(self, asins: List[str], skus: List[str], market: str,
+                                  interval: Tuple[str, str], chunk_size: int = 20) -> List[Dict]:
+        """
+        Obtener datos de ventas para múltiples ASIN/SKU de un mismo marketplace
+
+        getOrderMetrics solo admite un filtro de ASIN por llamada, por lo que
+        los pares se agrupan en bloques de `chunk_size` que se lanzan en
+        paralelo; el rate limiter del endpoint SALES regula el ritmo real.
+
+        Args:
+            asins: Lista de ASINs
+            skus: Lista de SKUs (mismo orden que asins)
+            market: ID del marketplace
+            interval: Tupla con fechas de inicio y fin
+            chunk_size: Número de pares por bloque paralelo
+
+        Returns:
+            Lista consolidada de datos de ventas
+        """
+        pairs = list(zip(asins, skus))
+        all_sales_data = []
+
+        for i in range(0, len(pairs), chunk_size):
+            chunk = pairs[i:i + chunk_size]
+
+            tasks = [
+                self.get_sales_data(
+                    asin=asin,
+                    sku=sku,
+                    market=[market],
+                    interval=interval
+                )
+                for asin, sku in chunk
+            ]
+
+            chunk_results = await asyncio.gather(*tasks, return_exceptions=True)
+
+            for (asin, sku), sales_data in zip(chunk, chunk_results):
+                if isinstance(sales_data, Exception):
+                    print(f"⚠️ Error obteniendo ventas para {asin}/{sku}: {sales_data}")
+                elif sales_data:
+                    all_sales_data.extend(sales_data)
+
+        return all_sales_data
+
     async def batch_get_orders(self, order_ids: List[str]) -> List[dict]:
         """
         Obtener múltiples órdenes en paralelo (respetando rate limits)
@@ -261,6 +314,24 @@ class AmazonAPIClient:
 
         raise Exception(f"Error obteniendo orden {order_id}")
 
+    @rate_limited(APIEndpoint.ORDERS)
+    @async_retry(max_retries=3, backoff_base=2)
+    async def get_orders_by_ids(self, order_ids: List[str], markets: List[str]) -> List[dict]:
+        """Obtener hasta 50 órdenes por ID en una sola llamada usando wrapper"""
+        result = await asyncio.to_thread(
+            self.api_wrapper.get_orders_by_ids,
+            order_ids=order_ids,
+            markets=markets
+        )
+
+        orders, success = result
+
+        if success:
+            print(f"Órdenes recuperadas por ID: {len(orders)}/{len(order_ids)}")
+            return orders
+
+        raise Exception(f"Error obteniendo {len(order_ids)} órdenes por ID")
+
     async def health_check(self) -> Dict[str, Any]:
         """
         Verificar estado de la conexión con Amazon SP-API
@@ -41,6 +41,65 @@ class AmazonSPAPIWrapper:
             role_arn=st.setting_cred_api_amz['role_arn']
         )
 
+    def get_orders_page(
+        self,
+        date_from: str,
+        date_to: str,
+        markets: List[str],
+        next_token: Optional[str] = None
+    ) -> Tuple[Dict, bool]:
+        """
+        Obtener una sola página de órdenes
+
+        Sin next_token se pide la primera página del periodo; con él, la
+        siguiente (como en load_all_pages, solo se envía el token). Al ser
+        una llamada por página, el cliente puede reintentar la página que
+        falle sin repetir las anteriores.
+
+        Args:
+            date_from: Fecha inicio ISO format
+            date_to: Fecha fin ISO format
+            markets: Lista de marketplace IDs
+            next_token: Token de la página siguiente (None para la primera)
+
+        Returns:
+            Tupla ({'orders': órdenes transformadas, 'next_token': token o None}, success flag)
+        """
+        try:
+            if next_token:
+                kwargs = {'NextToken': next_token}
+            else:
+                self.logger.debug(f"Fetching orders from {date_from} to {date_to}")
+                kwargs = {
+                    'CreatedAfter': date_from,
+                    'CreatedBefore': date_to,
+                    'MarketplaceIds': markets
+                }
+
+            response = Orders(credentials=self.credentials).get_orders(**kwargs)
+            payload = getattr(response, 'payload', None) or {}
+            orders = payload.get("Orders", [])
+            if orders:
+                self.logger.debug(f"Fetched {len(orders)} orders from page")
+
+            return {
+                'orders': self.order_transformer.transform_orders_batch(orders),
+                'next_token': payload.get("NextToken")
+            }, True
+
+        except SellingApiException as ex:
+            self.logger.error(f"Amazon API error: {ex}")
+
+            # Retornar código de error si es rate limit
+            if hasattr(ex, 'code') and ex.code == 429:
+                return {'code': 429}, False
+
+            return {}, False
+
+        except Exception as e:
+            self.logger.error(f"Unexpected error fetching orders page: {e}")
+            return {}, False
+
     def get_orders(
         self,
         date_from: str,
@@ -100,6 +159,50 @@ class AmazonSPAPIWrapper:
             self.logger.error(f"Unexpected error fetching orders: {e}")
             return [], False
 
+    def get_orders_by_ids(
+        self,
+        order_ids: List[str],
+        markets: List[str]
+    ) -> Tuple[List[Dict], bool]:
+        """
+        Obtener varias órdenes por ID en una sola llamada a getOrders
+
+        Args:
+            order_ids: IDs de órdenes (máximo 50 por llamada según SP-API)
+            markets: Lista de marketplace IDs
+
+        Returns:
+            Tupla (lista de órdenes transformadas, success flag)
+        """
+        try:
+            self.logger.debug(f"Fetching {len(order_ids)} orders by id")
+
+            response = Orders(credentials=self.credentials).get_orders(
+                AmazonOrderIds=order_ids,
+                MarketplaceIds=markets
+            )
+            raw_orders = response.payload.get("Orders", [])
+
+            # Transformar
+            transformed = self.order_transformer.transform_orders_batch(
+                raw_orders)
+
+            self.logger.info(
+                f"Fetched {len(transformed)} of {len(order_ids)} orders by id")
+            return transformed, True
+
+        except SellingApiException as ex:
+            self.logger.error(f"Amazon API error fetching orders by id: {ex}")
+
+            if hasattr(ex, 'code') and ex.code == 429:
+                return [{'code': 429}], False
+
+            return [], False
+
+        except Exception as e:
+            self.logger.error(f"Error fetching orders by id: {e}")
+            return [], False
+
     def get_order(self, order_id: str) -> Tuple[Optional[Dict], bool]:
         """
         Obtener una orden específica
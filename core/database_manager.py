@@ -1,4 +1,6 @@
 import logging
+from typing import Dict, Iterable, List
+
 import aiomysql
 import config.setting as st
 
@@ -94,6 +96,27 @@ class DatabaseManager:
                 self.pool, self.prestashop_pool)
         return self._shipment_repo
 
+    async def upsert_orders_and_items(self, orders: List[Dict], order_items: Iterable[Dict]) -> None:
+        """
+        Persistir órdenes y sus items en una única transacción
+
+        Una sola conexión y un único commit por lote en lugar de dos
+        escrituras autocommit independientes.
+        """
+        if not orders:
+            return
+
+        async with self.pool.acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cursor:
+                    await self.orders.upsert_orders(orders, cursor=cursor)
+                    await self.order_items.upsert_order_items(order_items, cursor=cursor)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+
     async def close_pool(self):
         """Cerrar pool principal"""
         if self.pool:
@@ -1,8 +1,10 @@
+import asyncio
 import logging
 from abc import ABC, abstractmethod
 from datetime import timedelta, datetime
-from typing import List
-from models.extraction_config import ExtractionConfig
+from typing import AsyncIterator, Dict, List, Type
+import pandas as pd
+from models.extraction_config import ExtractionConfig, ExtractType, TERMINAL_ORDER_STATUSES
 from utils.datetime_helper import datetime_helper
 
 """
@@ -21,12 +23,35 @@ class ExtractionStrategy(ABC):
         self.db_manager = db_manager
 
     @abstractmethod
-    async def extract(self, config: ExtractionConfig) -> List[dict]:
+    def extract(self, config: ExtractionConfig) -> AsyncIterator[List[dict]]:
+        """Entregar las órdenes a procesar en lotes, según se obtienen"""
         pass
 
 
+# Registro ExtractType -> clase de estrategia, poblado por @register_strategy
+_STRATEGIES: Dict[ExtractType, Type[ExtractionStrategy]] = {}
+
+
+def register_strategy(extract_type: ExtractType):
+    """Decorador de clase que registra una estrategia para un tipo de extracción"""
+    def decorator(cls: Type[ExtractionStrategy]) -> Type[ExtractionStrategy]:
+        _STRATEGIES[extract_type] = cls
+        return cls
+    return decorator
+
+
+def get_strategy_class(extract_type: ExtractType) -> Type[ExtractionStrategy]:
+    """Obtener la clase de estrategia registrada para un tipo de extracción"""
+    try:
+        return _STRATEGIES[extract_type]
+    except KeyError:
+        raise ValueError(
+            f"No hay estrategia registrada para {extract_type.value}") from None
+
+
+@register_strategy(ExtractType.DAILY_FULL)
 class DailyFullExtraction(ExtractionStrategy):
-    async def extract(self, config: ExtractionConfig) -> List[dict]:
+    async def extract(self, config: ExtractionConfig) -> AsyncIterator[List[dict]]:
         # Extraer órdenes del día anterior completo
         self.logger.info(
             f"Iniciando extraccion diaria desde {config.date_from} hasta {config.date_to}")
@@ -35,18 +60,21 @@ class DailyFullExtraction(ExtractionStrategy):
         self.logger.info(
             f"Minutos seguros: {self.datetime_helper.minutes_before_now}")
 
-        orders = await self.api_client.get_orders_paginated(
+        total = 0
+        async for page in self.api_client.iter_orders_paginated(
             date_from=config.date_from,
             date_to=config.date_to,
             markets=config.markets
-        )
+        ):
+            total += len(page)
+            yield page
 
-        self.logger.info(f"Extraccion diaria completa: {len(orders)} ordenes")
-        return orders
+        self.logger.info(f"Extraccion diaria completa: {total} ordenes")
 
 
+@register_strategy(ExtractType.INCREMENTAL)
 class IncrementalExtraction(ExtractionStrategy):
-    async def extract(self, config: ExtractionConfig) -> List[dict]:
+    async def extract(self, config: ExtractionConfig) -> AsyncIterator[List[dict]]:
         # Solo órdenes nuevas/modificadas de la última hora
         self.logger.info(
             f"Iniciando extraccion desde {config.date_from} hasta {config.date_to}")
@@ -54,46 +82,89 @@ class IncrementalExtraction(ExtractionStrategy):
             raise ValueError(
                 "DatabaseManager required for incremental extraction")
 
-        orders = await self.api_client.get_orders_paginated(
+        total = 0
+        async for page in self.api_client.iter_orders_paginated(
             date_from=config.date_from,
             date_to=config.date_to,
             markets=config.markets
-        )
+        ):
+            total += len(page)
+            yield page
+
         self.logger.info(
-            f"Extraccion incremental completada con exito: {len(orders)} orders")
-        return orders
+            f"Extraccion incremental completada con exito: {total} orders")
 
 
+@register_strategy(ExtractType.STATUS_UPDATE)
 class StatusUpdateExtraction(ExtractionStrategy):
-    async def extract(self, config: ExtractionConfig) -> List[dict]:
+    # Límite de AmazonOrderIds por llamada a getOrders
+    ORDER_IDS_PER_REQUEST = 50
+
+    async def extract(self, config: ExtractionConfig) -> AsyncIterator[List[dict]]:
         # 1. Obtener órdenes pendientes de la base de datos
         pending_orders = await self.db_manager.orders.get_pending_orders()
 
         if not pending_orders:
             self.logger.info("No hay ordenes pendientes de actualización")
-            return []
+            return
 
         self.logger.info(f"Ordenes de la base de datos: {len(pending_orders)}")
 
-        # 2. Obtener datos actuales de Amazon para cada orden
+        # Las órdenes en estado terminal ya no cambian: no consultar Amazon
+        pending_orders = [
+            order for order in pending_orders
+            if order.get('orderStatus') not in TERMINAL_ORDER_STATUSES
+        ]
+        if not pending_orders:
+            self.logger.info("Todas las ordenes pendientes estan en estado terminal")
+            return
+
+        # 2. Obtener datos actuales de Amazon en bloques de hasta 50 IDs
+        chunks = [
+            pending_orders[i:i + self.ORDER_IDS_PER_REQUEST]
+            for i in range(0, len(pending_orders), self.ORDER_IDS_PER_REQUEST)
+        ]
+        results = await asyncio.gather(*[
+            self.api_client.get_orders_by_ids(
+                [order['amazonOrderId'] for order in chunk],
+                config.markets
+            )
+            for chunk in chunks
+        ])
+
+        current_orders = {
+            order['amazonOrderId']: order
+            for chunk_orders in results
+            for order in chunk_orders
+        }
+
         updated_orders = []
 
         for order in pending_orders:
-            # Usar método específico para status
-            current_status = await self.api_client.get_order_status(order['amazonOrderId'])
+            current_status = current_orders.get(order['amazonOrderId'])
 
             if current_status and self._has_status_changed(order, current_status):
                 updated_orders.append(current_status)
 
-        return updated_orders
+        if updated_orders:
+            yield updated_orders
 
     def _has_status_changed(self, old_order: dict, new_order: dict) -> bool:
+        # Órdenes con checksum persistido: basta comparar un entero
+        old_checksum = old_order.get('checksum')
+        new_checksum = new_order.get('checksum')
+        if old_checksum is not None and new_checksum is not None:
+            return old_checksum != new_checksum
+
         return (old_order['orderStatus'] != new_order['orderStatus'] or
                 old_order['lastUpdateDate'] != new_order['lastUpdateDate'])
 
 
+@register_strategy(ExtractType.WEEKLY_CATCH_UP)
 class WeeklyCatchUpExtraction(ExtractionStrategy):
-    async def extract(self, config: ExtractionConfig) -> List[dict]:
+    COMPARE_COLUMNS = ['amazonOrderId', 'orderStatus', 'lastUpdateDate', 'checksum']
+
+    async def extract(self, config: ExtractionConfig) -> AsyncIterator[List[dict]]:
         """
         Reprocesar órdenes Pending que pueden haber cambiado en Amazon
         e insertar órdenes que no existen en la BD
@@ -105,54 +176,82 @@ class WeeklyCatchUpExtraction(ExtractionStrategy):
 
         self.logger.info(f"Órdenes Pending en BD a verificar: {len(stale_orders)}")
 
-        # 2. Obtener órdenes de Amazon para el mismo período
-        api_orders = await self.api_client.get_orders_paginated(
+        stale_orders_dict = {order['amazonOrderId']: order for order in stale_orders}
+
+        # 2. Comparar cada página de Amazon contra la BD según llega
+        total_api = total_deleted = total_inserted = 0
+
+        async for api_orders in self.api_client.iter_orders_paginated(
             date_from=config.date_from,
             date_to=config.date_to,
             markets=config.markets
-        )
+        ):
+            orders_to_delete, orders_to_insert = self._diff_page(
+                api_orders, stale_orders_dict)
 
-        self.logger.info(f"Órdenes obtenidas de Amazon API: {len(api_orders)}")
-
-        # 3. Crear diccionarios para comparación rápida
-        stale_orders_dict = {order['amazonOrderId']: order for order in stale_orders}
-        api_orders_dict = {order['amazonOrderId']: order for order in api_orders}
+            total_api += len(api_orders)
+            total_deleted += len(orders_to_delete)
+            total_inserted += len(orders_to_insert)
 
-        # 4. Identificar órdenes que necesitan actualización o inserción
-        orders_to_delete = []  # Para eliminar y reinsertar
-        orders_to_insert = []  # Para insertar nuevas
+            # Eliminar órdenes que han cambiado antes de reinsertarlas
+            if orders_to_delete:
+                await self.db_manager.orders.delete_orders(orders_to_delete)
 
-        # Verificar órdenes existentes que han cambiado
-        for order_id, api_order in api_orders_dict.items():
-            if order_id in stale_orders_dict:
-                # Existe en BD, verificar si cambió
-                if self._needs_refresh(stale_orders_dict[order_id], api_order):
-                    orders_to_delete.append(order_id)
-                    orders_to_insert.append(api_order)
-            else:
-                # No existe en BD, insertar
-                orders_to_insert.append(api_order)
+            if orders_to_insert:
+                yield orders_to_insert
 
-        self.logger.info(f"Órdenes a eliminar y reinsertar: {len(orders_to_delete)}")
-        self.logger.info(f"Órdenes totales a insertar: {len(orders_to_insert)}")
+        self.logger.info(f"Órdenes obtenidas de Amazon API: {total_api}")
+        self.logger.info(f"Órdenes a eliminar y reinsertar: {total_deleted}")
+        self.logger.info(f"Órdenes totales a insertar: {total_inserted}")
 
-        # 5. Eliminar órdenes que han cambiado
-        if orders_to_delete:
-            await self.db_manager.orders.delete_orders(orders_to_delete)
-
-        # 6. Retornar todas las órdenes a insertar
-        return orders_to_insert
+    def _diff_page(self, api_orders: List[dict], stale_orders_dict: dict):
+        """
+        Identificar órdenes de una página que necesitan actualización o inserción
 
-    def _needs_refresh(self, db_order: dict, api_order: dict) -> bool:
+        Returns:
+            Tupla (ids a eliminar y reinsertar, órdenes a insertar)
+        """
+        # Separar órdenes nuevas de las ya existentes con operaciones de conjuntos
+        api_orders_dict = {order['amazonOrderId']: order for order in api_orders}
+        common_ids = api_orders_dict.keys() & stale_orders_dict.keys()
+        new_ids = api_orders_dict.keys() - stale_orders_dict.keys()
+
+        # Comparar en bloque solo las órdenes presentes en BD y API
+        changed_ids = set()
+        if common_ids:
+            # dtype=object conserva la igualdad de Python (sin inferir fechas)
+            df_db = pd.DataFrame(
+                [stale_orders_dict[order_id] for order_id in common_ids],
+                columns=self.COMPARE_COLUMNS, dtype=object)
+            df_api = pd.DataFrame(
+                [api_orders_dict[order_id] for order_id in common_ids],
+                columns=self.COMPARE_COLUMNS, dtype=object)
+
+            merged = df_db.merge(df_api, on='amazonOrderId', suffixes=('_db', '_api'))
+
+            # Con checksum en ambos lados basta un entero; si no, comparar campos
+            has_checksum = merged['checksum_db'].notna() & merged['checksum_api'].notna()
+            changed = (
+                (has_checksum & (merged['checksum_db'] != merged['checksum_api'])) |
+                (~has_checksum & (
+                    self._differs(merged['orderStatus_db'], merged['orderStatus_api']) |
+                    self._differs(merged['lastUpdateDate_db'], merged['lastUpdateDate_api'])
+                ))
+            )
+            changed_ids = set(merged.loc[changed, 'amazonOrderId'])
+
+        # Insertar nuevas o cambiadas (conservando el orden de la API)
+        refresh_ids = new_ids | changed_ids
+        orders_to_insert = [
+            order for order_id, order in api_orders_dict.items() if order_id in refresh_ids
+        ]
+
+        return list(changed_ids), orders_to_insert
+
+    @staticmethod
+    def _differs(db_values: pd.Series, api_values: pd.Series) -> pd.Series:
         """
-        Verificar si una orden necesita actualización
-        Compara orderStatus, lastUpdateDate u otros campos relevantes
+        Comparar columnas BD vs API elemento a elemento
+        Dos valores nulos se consideran iguales (como None == None)
         """
-        if not api_order:
-            return False
-
-        # Verificar cambios en campos críticos
-        status_changed = db_order.get('orderStatus') != api_order.get('orderStatus')
-        last_update_changed = db_order.get('lastUpdateDate') != api_order.get('lastUpdateDate')
-
-        return status_changed or last_update_changed
+        return (db_values != api_values) & ~(db_values.isna() & api_values.isna())
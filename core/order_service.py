@@ -1,15 +1,19 @@
 import asyncio
+import itertools
+import re
+import time
+from collections import defaultdict
 from contextlib import asynccontextmanager
 import logging
 from core.database_manager import DatabaseManager
 from core.amazon_api_client import AmazonAPIClient
-from core.extraction_strategies import DailyFullExtraction, IncrementalExtraction, StatusUpdateExtraction, WeeklyCatchUpExtraction
+from core.extraction_strategies import ExtractionStrategy, get_strategy_class
 from config import setting as st
 from infrastructure.error_handling import EnhancedErrorHandler
 from infrastructure.metrics_collector import MetricsCollector
 from datetime import datetime
-from typing import List
-from models.extraction_config import ExtractionConfig, ExtractType
+from typing import Dict, List, Optional, Tuple
+from models.extraction_config import ExtractionConfig, ExtractType, TERMINAL_ORDER_STATUSES
 from infrastructure.base.async_service import AsyncService
 
 """
@@ -23,12 +27,25 @@ FUNCIONALIDAD:
 
 
 class OrderExtractionService(AsyncService):
+    # Lotes extraídos que pueden esperar en cola mientras se escriben en BD
+    PIPELINE_DEPTH = 4
+    # Intentos totales de extract_orders ante errores transitorios
+    MAX_RETRIES = 3
+    RETRY_ERROR_TYPES = (ConnectionError, TimeoutError, asyncio.TimeoutError)
+    RETRY_ERROR_PATTERN = re.compile(r'ConnectionError|TimeoutError|\b429\b')
+
     def __init__(self):
         super().__init__()
         self.db_manager = DatabaseManager()
         self.api_client = AmazonAPIClient()
         self.error_handler = EnhancedErrorHandler()
         self.metrics = MetricsCollector()
+        # Cache de items por orden: order_id -> (items, fetched_at, is_terminal)
+        # Sobrevive a los reintentos de extract_orders dentro del mismo proceso
+        self._items_cache: Dict[str, Tuple[List[dict], float, bool]] = {}
+        self._items_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # Estrategias creadas bajo demanda, una sola vez por servicio
+        self._strategy_cache: Dict[ExtractType, ExtractionStrategy] = {}
         # Registrar dependencias para AsyncService
         self.register_dependency(self.db_manager)
         self.register_dependency(self.error_handler)
@@ -57,75 +74,111 @@ class OrderExtractionService(AsyncService):
             'date_to': config.date_to.isoformat(),
             'markets': config.markets
         }
-        try:
-            async with self.lifecycle():
-                self.logger.info("Componentes inicializados correctamente")
-
-                # 1. Iniciar métricas
-                await self.metrics.record_process_start(config)
-                self.logger.info("Metricas inicializadas correctamente")
-
-                # 2. Obtener estrategia según tipo de extracción
-                strategy = self._get_extraction_strategy(config.extract_type)
-                self.logger.info(
-                    f"Estrategia obtenida correctamente: {strategy.__class__.__name__}")
-
-                # 3. Extraer órdenes usando la estrategia
-                orders = await strategy.extract(config)
-                if not orders:
-                    self.logger.info("No se encuentran ordenes para procesar")
-                    await self.metrics.record_process_success(config, len(orders))
-                    await self._ensure_finished()
-                    self.logger.info("Componentes finalizados correctamente")
-                    return True
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                async with self.lifecycle():
+                    self.logger.info("Componentes inicializados correctamente")
 
-                # 4. Procesar en lotes
-                if config.extract_type == ExtractType.STATUS_UPDATE:
-                    await self._process_status_updates(orders, config)
-                else:
-                    await self._process_orders_batch(orders, config)
+                    # 1. Iniciar métricas
+                    await self.metrics.record_process_start(config)
+                    self.logger.info("Metricas inicializadas correctamente")
 
-                # 5. Registrar éxito
-                await self.metrics.record_process_success(config, len(orders))
+                    # 2. Obtener estrategia según tipo de extracción
+                    strategy = self._get_extraction_strategy(config.extract_type)
+                    self.logger.info(
+                        f"Estrategia obtenida correctamente: {strategy.__class__.__name__}")
 
-                # Success notification (solo para procesos importantes)
-                if config.extract_type == ExtractType.DAILY_FULL:
-                    await self._send_success_notification(config, len(orders))
+                    # 3. Extraer y procesar órdenes por lotes según llegan
+                    total_orders = await self._run_pipeline(strategy, config)
 
-                await self._ensure_finished()
-                self.logger.info("Componentes finalizados correctamente")
+                    if not total_orders:
+                        self.logger.info("No se encuentran ordenes para procesar")
 
-                return True
+                    # 4. Registrar éxito
+                    await self.metrics.record_process_success(config, total_orders)
 
-        except Exception as e:
+                    # Success notification (solo para procesos importantes)
+                    if config.extract_type == ExtractType.DAILY_FULL:
+                        await self._send_success_notification(config, total_orders)
 
-            # error_handler para manejo completo
-            await self.error_handler.handle_error(e, context)
+                    await self._ensure_finished()
+                    self.logger.info("Componentes finalizados correctamente")
+
+                    return True
 
-            # Registrar error en métricas
-            await self.metrics.record_process_error(config, e)
+            except Exception as e:
 
-            # Decidir si reintentar
-            if self._should_retry(e):
-                await asyncio.sleep(30)
-                return await self.extract_orders(config)
-            else:
-                raise
+                # error_handler para manejo completo (también registra la
+                # métrica del error)
+                await self.error_handler.handle_error(e, context)
+
+                # Decidir si reintentar
+                if not self._should_retry(e) or attempt == self.MAX_RETRIES - 1:
+                    raise
+
+                await asyncio.sleep(min(30 * 2 ** attempt, 300))
 
     def _should_retry(self, error: Exception) -> bool:
         """Determinar si se debe reintentar"""
-        retry_errors = ['ConnectionError', 'TimeoutError', '429']
-        error_str = str(error)
-        return any(retry_error in error_str for retry_error in retry_errors)
-
-    def _get_extraction_strategy(self, extract_type: ExtractType):
-        strategies = {
-            ExtractType.DAILY_FULL: DailyFullExtraction(self.api_client),
-            ExtractType.INCREMENTAL: IncrementalExtraction(self.api_client, self.db_manager),
-            ExtractType.STATUS_UPDATE: StatusUpdateExtraction(self.api_client, self.db_manager),
-            ExtractType.WEEKLY_CATCH_UP: WeeklyCatchUpExtraction(self.api_client, self.db_manager),
-        }
-        return strategies[extract_type]
+        if isinstance(error, self.RETRY_ERROR_TYPES):
+            return True
+        # Errores envueltos (p.ej. Exception genérica con el mensaje original)
+        return bool(self.RETRY_ERROR_PATTERN.search(str(error)))
+
+    def _get_extraction_strategy(self, extract_type: ExtractType) -> ExtractionStrategy:
+        strategy = self._strategy_cache.get(extract_type)
+        if strategy is None:
+            strategy_cls = get_strategy_class(extract_type)
+            strategy = strategy_cls(self.api_client, self.db_manager)
+            self._strategy_cache[extract_type] = strategy
+        return strategy
+
+    async def _run_pipeline(self, strategy, config: ExtractionConfig) -> int:
+        """
+        Solapar extracción (red) y escritura en BD mediante una cola acotada
+
+        La estrategia produce lotes en una tarea aparte mientras este método
+        los consume; la cola limita cuántos lotes quedan en memoria.
+
+        Returns:
+            Número total de órdenes procesadas
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.PIPELINE_DEPTH)
+
+        async def produce():
+            try:
+                async for orders in strategy.extract(config):
+                    await queue.put(orders)
+            except Exception as e:
+                # Entregar el error al consumidor para que lo relance
+                await queue.put(e)
+                return
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        total_orders = 0
+
+        try:
+            while (orders := await queue.get()) is not None:
+                if isinstance(orders, Exception):
+                    raise orders
+
+                if config.extract_type == ExtractType.STATUS_UPDATE:
+                    await self._process_status_updates(orders, config)
+                else:
+                    await self._process_orders_batch(orders, config)
+                total_orders += len(orders)
+        finally:
+            if not producer.done():
+                producer.cancel()
+                # Esperar a que la tarea termine; si este método se ha
+                # cancelado, la excepción en curso sigue propagándose
+                try:
+                    await producer
+                except asyncio.CancelledError:
+                    pass
+
+        return total_orders
 
     async def _process_orders_batch(self, orders: List[dict], config: ExtractionConfig):
         """Procesa órdenes, items y ventas en lotes"""
@@ -137,72 +190,119 @@ class OrderExtractionService(AsyncService):
             print(
                 f"Procesamiento por lotes {i//batch_size + 1} : {len(batch)} ordenes")
 
-            # 1. UPSERT órdenes
-            await self.db_manager.orders.upsert_orders(batch)
-
             if config.extract_type == ExtractType.STATUS_UPDATE:
+                await self.db_manager.orders.upsert_orders(batch)
                 return
 
-            # 2. Procesar items de cada orden
-            all_order_items = []
+            # 1. Procesar items de cada orden
+            order_items_lists = []
             all_sales = []
 
-            for order in batch:
-                order_id = order.get('amazonOrderId')
-                if not order_id:
-                    continue
-
-                try:
-                    # Obtener items de la orden
-                    order_items = await self.api_client.get_order_items(
-                        order_id
-                    )
+            # (asin, sku, marketplaceId) -> órdenes que lo contienen
+            sales_requests: Dict[Tuple[str, str, str], List[str]] = {}
 
-                    if order_items:
-                        all_order_items.extend(order_items)
+            # Obtener items de todas las órdenes del lote en paralelo (concurrencia acotada)
+            semaphore = asyncio.Semaphore(config.items_concurrency)
 
-                        # Obtener ventas para cada item único (ASIN/SKU)
-                        unique_items = self._get_unique_items(order_items)
+            async def fetch_items(order: dict) -> List[dict]:
+                async with semaphore:
+                    return await self._cached_items(
+                        order['amazonOrderId'],
+                        order.get('orderStatus'),
+                        config.items_cache_ttl_seconds
+                    )
 
-                        for item in unique_items:
-                            sales_data = await self.api_client.get_sales_data(
-                                asin=item['asin'],
-                                sku=item['sku'],
-                                market=[order.get('marketplaceId')],
-                                interval=(config.date_from.isoformat(
-                                ) + "-00:00", config.date_to.isoformat() + "-00:00")
-                            )
+            orders_with_id = [order for order in batch if order.get('amazonOrderId')]
+            items_results = await asyncio.gather(
+                *(fetch_items(order) for order in orders_with_id),
+                return_exceptions=True
+            )
 
-                            if sales_data:
-                                all_sales.extend(sales_data)
+            for order, order_items in zip(orders_with_id, items_results):
+                order_id = order['amazonOrderId']
 
-                except Exception as e:
-                    print(f"Error procesando orden {order_id}: {e}")
+                if isinstance(order_items, Exception):
+                    print(f"Error procesando orden {order_id}: {order_items}")
                     # Continuar con las siguientes órdenes
                     continue
 
-            # 3. UPSERT items y ventas si hay datos
-            if all_order_items:
-                await self.db_manager.order_items.upsert_order_items(all_order_items)
+                if order_items:
+                    order_items_lists.append(order_items)
+
+                    # Registrar cada item único (ASIN/SKU) para pedir ventas al final del lote
+                    unique_items = self._get_unique_items(order_items)
+
+                    for item in unique_items:
+                        key = (item['asin'], item['sku'], order.get('marketplaceId'))
+                        sales_requests.setdefault(key, []).append(order_id)
+
+            # Ventas: una petición agrupada por marketplace para todo el lote
+            if sales_requests:
+                interval = (config.date_from.isoformat() + "-00:00",
+                            config.date_to.isoformat() + "-00:00")
+
+                items_by_market: Dict[str, List[Tuple[str, str]]] = {}
+                for asin, sku, marketplace_id in sales_requests:
+                    items_by_market.setdefault(marketplace_id, []).append((asin, sku))
+
+                market_results = await asyncio.gather(*[
+                    self.api_client.get_sales_data_bulk(
+                        asins=[asin for asin, _ in items],
+                        skus=[sku for _, sku in items],
+                        market=marketplace_id,
+                        interval=interval
+                    )
+                    for marketplace_id, items in items_by_market.items()
+                ], return_exceptions=True)
+
+                for marketplace_id, sales_data in zip(items_by_market, market_results):
+                    if isinstance(sales_data, Exception):
+                        print(f"Error obteniendo ventas del marketplace {marketplace_id}: {sales_data}")
+                    elif sales_data:
+                        all_sales.extend(sales_data)
+
+            # 2. UPSERT órdenes e items en una sola transacción
+            await self.db_manager.upsert_orders_and_items(
+                batch, itertools.chain.from_iterable(order_items_lists))
 
             # if all_sales:
             #     await self.db_manager.sales.upsert_sales(all_sales)
 
             print(
-                f"Procesamiento por lotes completados: \n{len(batch)} ordenes. \n{len(all_order_items)} elementos de ordenes. \n{len(all_sales)} estadisticas de ventas.")
+                f"Procesamiento por lotes completados: \n{len(batch)} ordenes. \n{sum(map(len, order_items_lists))} elementos de ordenes. \n{len(all_sales)} estadisticas de ventas.")
+
+    async def _cached_items(self, order_id: str, order_status: Optional[str],
+                            ttl_seconds: int) -> List[dict]:
+        """
+        Obtener items de una orden reutilizando resultados previos
+
+        Las órdenes en estado terminal se cachean sin caducidad; el resto
+        expira tras `ttl_seconds` para recoger cambios en curso.
+        """
+        async with self._items_locks[order_id]:
+            cached = self._items_cache.get(order_id)
+            if cached:
+                items, fetched_at, is_terminal = cached
+                if is_terminal or time.monotonic() - fetched_at < ttl_seconds:
+                    return items
+
+            items = await self.api_client.get_order_items(order_id)
+            self._items_cache[order_id] = (
+                items,
+                time.monotonic(),
+                order_status in TERMINAL_ORDER_STATUSES
+            )
+            return items
 
     def _get_unique_items(self, order_items: List[dict]) -> List[dict]:
         """Obtener items únicos por ASIN/SKU para evitar duplicar llamadas de ventas"""
-        seen = set()
-        unique_items = []
+        # dict conserva orden de inserción; setdefault mantiene el primer item de cada clave
+        unique_items = {}
 
         for item in order_items:
-            key = (item.get('asin'), item.get('sku'))
-            if key not in seen:
-                seen.add(key)
-                unique_items.append(item)
+            unique_items.setdefault((item.get('asin'), item.get('sku')), item)
 
-        return unique_items
+        return list(unique_items.values())
 
     async def _process_status_updates(self, orders: List[dict], config: ExtractionConfig):
         """Procesar actualizaciones de estado solamente"""
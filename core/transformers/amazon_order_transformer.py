@@ -3,56 +3,92 @@
 Transformador especializado para órdenes de Amazon
 Responsabilidad única: Transformar respuestas de API a formato interno
 """
+import hashlib
+import json
+from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import config.setting as st
 
+# Diferencia horaria UTC de la configuración, leída una vez al importar
+_DEFAULT_UTC_OFFSET = getattr(st, 'difHoursUtc', 1)
+
+# Remover 'T' y 'Z' para formato MySQL en una sola pasada
+_ISO_TO_MYSQL = str.maketrans({'T': ' ', 'Z': ''})
+
+
+@lru_cache(maxsize=8192)
+def _parse_dt(dt_str: Optional[str]) -> Optional[str]:
+    """Fecha ISO de Amazon (e.g. "2024-01-15T10:30:00Z") a formato MySQL o None"""
+    return dt_str.translate(_ISO_TO_MYSQL) if dt_str else None
+
+
+@lru_cache(maxsize=8192)
+def _parse_datetime_local(dt_str: str, utc_delta: timedelta) -> datetime:
+    """Fecha ISO de Amazon a datetime local (cacheado por string y offset)"""
+    # Formato fijo de SP-API "YYYY-MM-DDTHH:MM:SSZ": slicing directo sin strptime
+    utc_dt = datetime(int(dt_str[0:4]), int(dt_str[5:7]), int(dt_str[8:10]),
+                      int(dt_str[11:13]), int(dt_str[14:16]), int(dt_str[17:19]))
+    return utc_dt + utc_delta
+
 
 class AmazonOrderTransformer:
     """Transforma datos de órdenes desde Amazon SP-API a formato de BD"""
 
+    __slots__ = ('utc_offset_hours', '_utc_delta')
+
     def __init__(self, utc_offset_hours: int = None):
         """
         Args:
             utc_offset_hours: Diferencia horaria UTC (default: configuración)
         """
-        self.utc_offset_hours = utc_offset_hours or getattr(
-            st, 'difHoursUtc', 1)
+        self.utc_offset_hours = (utc_offset_hours if utc_offset_hours is not None
+                                 else _DEFAULT_UTC_OFFSET)
+        self._utc_delta = timedelta(hours=self.utc_offset_hours)
 
-    def transform_order(self, raw_order: Dict) -> Dict:
+    def transform_order(self, raw_order: Dict, now: Optional[datetime] = None) -> Dict:
         """
         Transformar una orden individual desde formato Amazon API
 
         Args:
             raw_order: Orden en formato Amazon SP-API
+            now: Timestamp de carga (default: datetime.now())
 
         Returns:
             Orden en formato para base de datos
         """
+        now = now or datetime.now()
+
+        # Subdiccionarios leídos una sola vez
+        shipping = raw_order.get('ShippingAddress') or {}
+        buyer = raw_order.get('BuyerInfo') or {}
+        order_total = raw_order.get('OrderTotal') or {}
+
         return {
-            'purchaseDate': self._parse_datetime(raw_order.get('PurchaseDate')),
+            'purchaseDate': _parse_dt(raw_order.get('PurchaseDate')),
             'purchaseDateEs': self._parse_datetime_local(raw_order.get('PurchaseDate')),
             'salesChannel': raw_order.get('SalesChannel'),
             'amazonOrderId': raw_order.get('AmazonOrderId'),
-            'buyerEmail': self._extract_buyer_email(raw_order),
-            'earliestShipDate': self._parse_datetime(raw_order.get('EarliestShipDate')),
-            'latestShipDate': self._parse_datetime(raw_order.get('LatestShipDate')),
-            'earliestDeliveryDate': self._parse_datetime(raw_order.get('EarliestDeliveryDate')),
-            'latestDeliveryDate': self._parse_datetime(raw_order.get('LatestDeliveryDate')),
-            'lastUpdateDate': self._parse_datetime(raw_order.get('LastUpdateDate')),
+            'buyerEmail': buyer.get('BuyerEmail'),
+            'earliestShipDate': _parse_dt(raw_order.get('EarliestShipDate')),
+            'latestShipDate': _parse_dt(raw_order.get('LatestShipDate')),
+            'earliestDeliveryDate': _parse_dt(raw_order.get('EarliestDeliveryDate')),
+            'latestDeliveryDate': _parse_dt(raw_order.get('LatestDeliveryDate')),
+            'lastUpdateDate': _parse_dt(raw_order.get('LastUpdateDate')),
             'isBusinessOrder': raw_order.get('IsBusinessOrder', False),
             'marketplaceId': raw_order.get('MarketplaceId'),
             'numberOfItemsShipped': raw_order.get('NumberOfItemsShipped', 0),
             'numberOfItemsUnshipped': raw_order.get('NumberOfItemsUnshipped', 0),
             'orderStatus': raw_order.get('OrderStatus'),
-            'totalOrderCurrencyCode': self._extract_currency_code(raw_order),
-            'totalOrderAmount': self._extract_order_amount(raw_order),
-            'city': self._extract_shipping_field(raw_order, 'City'),
-            'countryCode': self._extract_shipping_field(raw_order, 'CountryCode'),
-            'postalCode': self._extract_shipping_field(raw_order, 'PostalCode'),
-            'stateOrRegion': self._extract_shipping_field(raw_order, 'StateOrRegion'),
-            'loadDate': datetime.now().date(),
-            'loadDateTime': datetime.now()
+            'totalOrderCurrencyCode': order_total.get('CurrencyCode', 'S/D'),
+            'totalOrderAmount': float(order_total.get('Amount', 0)),
+            'city': shipping.get('City', 'S/D'),
+            'countryCode': shipping.get('CountryCode', 'S/D'),
+            'postalCode': shipping.get('PostalCode', 'S/D'),
+            'stateOrRegion': shipping.get('StateOrRegion', 'S/D'),
+            'checksum': self._compute_checksum(raw_order),
+            'loadDate': now.date(),
+            'loadDateTime': now
         }
 
     def transform_orders_batch(self, raw_orders: List[Dict]) -> List[Dict]:
@@ -65,23 +101,9 @@ class AmazonOrderTransformer:
         Returns:
             Lista de órdenes transformadas
         """
-        return [self.transform_order(order) for order in raw_orders]
-
-    def _parse_datetime(self, dt_str: Optional[str]) -> Optional[str]:
-        """
-        Parser para fechas de Amazon - formato UTC
-
-        Args:
-            dt_str: String de fecha en formato ISO (e.g., "2024-01-15T10:30:00Z")
-
-        Returns:
-            Fecha formateada sin timezone o None
-        """
-        if not dt_str:
-            return None
-
-        # Remover 'T' y 'Z' para formato MySQL
-        return dt_str.replace('T', ' ').replace('Z', '')
+        # Un único timestamp de carga para todo el lote
+        now = datetime.now()
+        return [self.transform_order(order, now) for order in raw_orders]
 
     def _parse_datetime_local(self, dt_str: Optional[str]) -> Optional[datetime]:
         """
@@ -97,37 +119,22 @@ class AmazonOrderTransformer:
             return None
 
         # Parsear y ajustar por timezone
-        clean_str = dt_str.replace('T', ' ').replace('Z', '')
-        utc_dt = datetime.strptime(clean_str, '%Y-%m-%d %H:%M:%S')
-        local_dt = utc_dt + timedelta(hours=self.utc_offset_hours)
+        return _parse_datetime_local(dt_str, self._utc_delta)
 
-        return local_dt
-
-    def _extract_buyer_email(self, order: Dict) -> Optional[str]:
-        """Extraer email del comprador de forma segura"""
-        buyer_info = order.get('BuyerInfo', {})
-        return buyer_info.get('BuyerEmail') if buyer_info else None
-
-    def _extract_currency_code(self, order: Dict) -> str:
-        """Extraer código de moneda del total de la orden"""
-        order_total = order.get('OrderTotal', {})
-        return order_total.get('CurrencyCode', 'S/D') if order_total else 'S/D'
-
-    def _extract_order_amount(self, order: Dict) -> float:
-        """Extraer monto total de la orden"""
-        order_total = order.get('OrderTotal', {})
-        return float(order_total.get('Amount', 0)) if order_total else 0.0
-
-    def _extract_shipping_field(self, order: Dict, field_name: str) -> str:
+    def _compute_checksum(self, raw_order: Dict) -> int:
         """
-        Extraer campo de dirección de envío de forma segura
+        Hash de 64 bits del payload original de Amazon
+
+        Permite detectar cambios en la orden comparando un único entero
+        en lugar de campo por campo.
 
         Args:
-            order: Orden completa
-            field_name: Nombre del campo a extraer (City, CountryCode, etc.)
+            raw_order: Orden en formato Amazon SP-API
 
         Returns:
-            Valor del campo o "S/D" si no existe
+            Entero sin signo de 64 bits (BIGINT UNSIGNED en BD)
         """
-        shipping_address = order.get('ShippingAddress', {})
-        return shipping_address.get(field_name, 'S/D') if shipping_address else 'S/D'
+        canonical = json.dumps(raw_order, sort_keys=True,
+                               separators=(',', ':'), default=str)
+        digest = hashlib.blake2b(canonical.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
@@ -2,23 +2,46 @@
 Transformador especializado para datos de ventas
 """
 from datetime import datetime, timedelta
-from typing import Dict, List
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
 import config.setting as st
 
+# Diferencia horaria UTC de la configuración, leída una vez al importar
+_DEFAULT_UTC_OFFSET = getattr(st, 'difHoursUtc', 1)
+
 
 class AmazonSalesTransformer:
     """Transforma datos de ventas desde Amazon SP-API"""
 
+    __slots__ = ('utc_offset_hours', '_utc_delta')
+
+    # A partir de este tamaño el lote se transforma por columnas con pandas
+    VECTORIZE_THRESHOLD = 500
+
+    # Orden de columnas de una métrica transformada
+    SALE_FIELDS = (
+        'asin', 'sku', 'marketplaceId', 'saleDateTime', 'saleDate', 'intervalHour',
+        'saleDateEs', 'intervalHourEs', 'qOrders', 'avgPriceUndCurrencyCode',
+        'avgPriceUndAmount', 'undSold', 'totalPriceSoldCurrencyCode',
+        'totalPriceSoldAmount', 'loadDate', 'loadDateTime'
+    )
+
     def __init__(self, utc_offset_hours: int = None):
-        self.utc_offset_hours = utc_offset_hours or getattr(
-            st, 'difHoursUtc', 1)
+        self.utc_offset_hours = (utc_offset_hours if utc_offset_hours is not None
+                                 else _DEFAULT_UTC_OFFSET)
+        self._utc_delta = timedelta(hours=self.utc_offset_hours)
 
     def transform_sale_metric(
         self,
         raw_metric: Dict,
         asin: str,
         sku: str,
-        marketplace_id: str
+        marketplace_id: str,
+        now: Optional[datetime] = None
     ) -> Dict:
         """
         Transformar una métrica individual de ventas
@@ -28,11 +51,15 @@ class AmazonSalesTransformer:
             asin: ASIN del producto
             sku: SKU del producto
             marketplace_id: ID del marketplace
+            now: Timestamp de carga (default: datetime.now())
 
         Returns:
             Métrica transformada para BD
         """
+        now = now or datetime.now()
         interval = raw_metric.get('interval', '')
+        avg_currency, avg_amount = self._extract_money(raw_metric, 'averageUnitPrice')
+        total_currency, total_amount = self._extract_money(raw_metric, 'totalSales')
 
         return {
             'asin': asin,
@@ -44,13 +71,13 @@ class AmazonSalesTransformer:
             'saleDateEs': self._parse_sale_date_local(interval),
             'intervalHourEs': self._extract_hour_local(interval),
             'qOrders': raw_metric.get('orderCount', 0),
-            'avgPriceUndCurrencyCode': self._extract_avg_price_currency(raw_metric),
-            'avgPriceUndAmount': self._extract_avg_price_amount(raw_metric),
+            'avgPriceUndCurrencyCode': avg_currency,
+            'avgPriceUndAmount': avg_amount,
             'undSold': raw_metric.get('unitCount', 0),
-            'totalPriceSoldCurrencyCode': self._extract_total_sales_currency(raw_metric),
-            'totalPriceSoldAmount': self._extract_total_sales_amount(raw_metric),
-            'loadDate': datetime.now().date(),
-            'loadDateTime': datetime.now()
+            'totalPriceSoldCurrencyCode': total_currency,
+            'totalPriceSoldAmount': total_amount,
+            'loadDate': now.date(),
+            'loadDateTime': now
         }
 
     def transform_sales_batch(
@@ -64,12 +91,81 @@ class AmazonSalesTransformer:
         Transformar múltiples métricas de ventas
         Solo incluye métricas con ventas (unitCount > 0)
         """
+        # Un único timestamp de carga para todo el lote
+        now = datetime.now()
+        metrics = [metric for metric in raw_metrics if metric.get('unitCount', 0) > 0]
+
+        if len(metrics) >= self.VECTORIZE_THRESHOLD:
+            return self._transform_sales_frame(metrics, asin, sku, marketplace_id, now)
+
         return [
-            self.transform_sale_metric(metric, asin, sku, marketplace_id)
-            for metric in raw_metrics
-            if metric.get('unitCount', 0) > 0
+            self.transform_sale_metric(metric, asin, sku, marketplace_id, now)
+            for metric in metrics
         ]
 
+    def _transform_sales_frame(
+        self,
+        metrics: List[Dict],
+        asin: str,
+        sku: str,
+        marketplace_id: str,
+        now: datetime
+    ) -> List[Dict]:
+        """
+        Transformar un lote grande de métricas por columnas
+
+        Recorre las métricas una sola vez llenando listas paralelas (un
+        acceso por subdiccionario), parsea todas las fechas con un único
+        pd.to_datetime (cache=True, los intervalos horarios se repiten) y
+        construye los dicts de salida al final en una sola pasada.
+        """
+        intervals, q_orders, und_sold = [], [], []
+        avg_currencies, avg_amounts = [], []
+        total_currencies, total_amounts = [], []
+
+        for metric in metrics:
+            avg_currency, avg_amount = self._extract_money(metric, 'averageUnitPrice')
+            total_currency, total_amount = self._extract_money(metric, 'totalSales')
+
+            intervals.append(metric.get('interval') or '')
+            q_orders.append(metric.get('orderCount', 0))
+            und_sold.append(metric.get('unitCount', 0))
+            avg_currencies.append(avg_currency)
+            avg_amounts.append(avg_amount)
+            total_currencies.append(total_currency)
+            total_amounts.append(total_amount)
+
+        interval_series = pd.Series(intervals, dtype=object)
+        starts = interval_series.str.slice(0, 16)
+
+        utc = pd.to_datetime(starts, format='%Y-%m-%dT%H:%M', errors='coerce', cache=True)
+        local = (utc + pd.Timedelta(self._utc_delta) if self._utc_delta else utc).to_numpy()
+
+        # Formatear en C con NumPy ("YYYY-MM-DDTHH:MM") en lugar de strftime por fila
+        local_str = pd.Series(np.datetime_as_string(local, unit='m'), dtype=object)
+        local_str[np.isnat(local)] = ''
+
+        columns = (
+            repeat(asin),
+            repeat(sku),
+            repeat(marketplace_id),
+            starts.str.replace('T', ' ', regex=False).tolist(),
+            interval_series.str.slice(0, 10).tolist(),
+            interval_series.str.slice(11, 16).where(interval_series.str.len() >= 16, '').tolist(),
+            local_str.str.slice(0, 10).tolist(),
+            local_str.str.slice(11, 16).tolist(),
+            q_orders,
+            avg_currencies,
+            avg_amounts,
+            und_sold,
+            total_currencies,
+            total_amounts,
+            repeat(now.date()),
+            repeat(now),
+        )
+
+        return [dict(zip(self.SALE_FIELDS, row)) for row in zip(*columns)]
+
     def _parse_sale_datetime(self, interval: str) -> str:
         """
         Parsear datetime de ventas (formato: "2024-01-15T10:00:00Z")
@@ -103,9 +199,11 @@ class AmazonSalesTransformer:
 
         try:
             # Parsear y ajustar
-            clean = interval[:16].replace('T', ' ')
-            utc_dt = datetime.strptime(clean, '%Y-%m-%d %H:%M')
-            local_dt = utc_dt + timedelta(hours=self.utc_offset_hours)
+            utc_dt = self._slice_interval_start(interval)
+            if not self._utc_delta:
+                # Sin diferencia horaria la fecha local es la UTC ya validada
+                return interval[:10]
+            local_dt = utc_dt + self._utc_delta
             return local_dt.strftime('%Y-%m-%d')
         except:
             return ''
@@ -116,29 +214,33 @@ class AmazonSalesTransformer:
             return ''
 
         try:
-            clean = interval[:16].replace('T', ' ')
-            utc_dt = datetime.strptime(clean, '%Y-%m-%d %H:%M')
-            local_dt = utc_dt + timedelta(hours=self.utc_offset_hours)
+            utc_dt = self._slice_interval_start(interval)
+            if not self._utc_delta:
+                return interval[11:16]
+            local_dt = utc_dt + self._utc_delta
             return local_dt.strftime('%H:%M')
         except:
             return ''
 
-    def _extract_avg_price_currency(self, metric: Dict) -> str:
-        """Extraer código de moneda del precio promedio"""
-        avg_price = metric.get('averageUnitPrice', {})
-        return avg_price.get('currencyCode', 'S/D') if avg_price else 'S/D'
-
-    def _extract_avg_price_amount(self, metric: Dict) -> float:
-        """Extraer monto del precio promedio"""
-        avg_price = metric.get('averageUnitPrice', {})
-        return float(avg_price.get('amount', 0)) if avg_price else 0.0
-
-    def _extract_total_sales_currency(self, metric: Dict) -> str:
-        """Extraer código de moneda de ventas totales"""
-        total_sales = metric.get('totalSales', {})
-        return total_sales.get('currencyCode', 'S/D') if total_sales else 'S/D'
-
-    def _extract_total_sales_amount(self, metric: Dict) -> float:
-        """Extraer monto de ventas totales"""
-        total_sales = metric.get('totalSales', {})
-        return float(total_sales.get('amount', 0)) if total_sales else 0.0
+    def _slice_interval_start(self, interval: str) -> datetime:
+        """
+        Inicio del intervalo ("YYYY-MM-DDTHH:MM...") como datetime
+
+        Slicing de posiciones fijas en lugar de strptime.
+        """
+        return datetime(int(interval[0:4]), int(interval[5:7]), int(interval[8:10]),
+                        int(interval[11:13]), int(interval[14:16]))
+
+    def _extract_money(self, metric: Dict, key: str) -> Tuple[str, float]:
+        """
+        Extraer código de moneda y monto de un campo monetario
+
+        Args:
+            metric: Métrica completa
+            key: Campo monetario ('averageUnitPrice', 'totalSales')
+
+        Returns:
+            Tupla (código de moneda o 'S/D', monto o 0.0)
+        """
+        money = metric.get(key) or {}
+        return money.get('currencyCode', 'S/D'), float(money.get('amount', 0))
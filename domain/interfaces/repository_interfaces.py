@@ -3,7 +3,7 @@
 Interfaces para repositorios - definen contratos entre capas
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Iterable, List, Dict
 from datetime import datetime, timedelta
 import pandas as pd
 
@@ -46,7 +46,7 @@ class IOrderItemRepository(ABC):
     """Interface para operaciones de items de órdenes"""
 
     @abstractmethod
-    async def upsert_order_items(self, order_items: List[Dict]) -> None:
+    async def upsert_order_items(self, order_items: Iterable[Dict]) -> None:
         """Insertar o actualizar items de órdenes"""
         pass
 
@@ -68,6 +68,11 @@ class IOrderDetailRepository(ABC):
         """Obtener detalles de órdenes existentes"""
         pass
 
+    @abstractmethod
+    async def get_existing_change_hashes(self, unique_keys: List[str]) -> pd.DataFrame:
+        """Obtener clave y hash de campos modificables de order details existentes"""
+        pass
+
     @abstractmethod
     async def insert_order_details(self, df: pd.DataFrame) -> None:
         """Insertar nuevos order details"""
@@ -1,3 +1,4 @@
+import asyncio
 import aiosmtplib as aiosmtpd
 import ssl
 from email.mime.text import MIMEText
@@ -14,11 +15,34 @@ FUNCIONALIDAD:
 """
 
 class AsyncEmailClient:
+    # Mensajes por conexión antes de reabrirla (los servidores limitan la sesión)
+    MAX_MESSAGES_PER_CONNECTION = 100
+
     def __init__(self):
         self.smtp_server = "smtp.office365.com"
         self.smtp_port = 587
         self.sender_email = st.setting_email['sender']
         self.sender_password = st.setting_email['password']
+        # Contexto SSL y conexión SMTP reutilizados entre envíos
+        self._ssl_ctx = ssl.create_default_context()
+        self._smtp = None
+        self._smtp_lock = asyncio.Lock()
+        self._sent_on_conn = 0
+
+    async def _get_conn(self) -> aiosmtpd.SMTP:
+        """Obtener la conexión SMTP abierta, conectando (STARTTLS + login) si hace falta"""
+        if self._smtp is None or not self._smtp.is_connected:
+            self._smtp = aiosmtpd.SMTP(
+                hostname=self.smtp_server,
+                port=self.smtp_port,
+                start_tls=True,
+                tls_context=self._ssl_ctx,
+                username=self.sender_email,
+                password=self.sender_password
+            )
+            await self._smtp.connect()
+            self._sent_on_conn = 0
+        return self._smtp
 
     async def send_email(self, subject: str, html_body: str, recipients: List[str]):
         """Enviar email asíncrono"""
@@ -28,26 +52,42 @@ class AsyncEmailClient:
             message['From'] = self.sender_email
             message['To'] = ', '.join(recipients)
             message['X-Priority'] = '2'
-            
+
             html_part = MIMEText(html_body, 'html', 'utf-8')
             message.attach(html_part)
-            
-            # Crear contexto SSL
-            context = ssl.create_default_context()
-            
-            # Enviar
-            await aiosmtpd.send(
-                message,
-                hostname=self.smtp_server,
-                port=self.smtp_port,
-                start_tls=True,
-                username=self.sender_email,
-                password=self.sender_password
-            )
-                
+
+            # Enviar por la conexión compartida; si el servidor la cerró, reconectar una vez
+            async with self._smtp_lock:
+                try:
+                    conn = await self._get_conn()
+                    await conn.send_message(message)
+                except aiosmtpd.SMTPServerDisconnected:
+                    self._smtp = None
+                    conn = await self._get_conn()
+                    await conn.send_message(message)
+
+                # Renovar la conexión tras MAX_MESSAGES_PER_CONNECTION envíos
+                self._sent_on_conn += 1
+                if self._sent_on_conn >= self.MAX_MESSAGES_PER_CONNECTION:
+                    await self._quit_conn()
+
         except Exception as e:
             print(f"Error enviando email: {e}")
-        
+
+    async def close(self):
+        """Cerrar la conexión SMTP si está abierta"""
+        async with self._smtp_lock:
+            await self._quit_conn()
+
+    async def _quit_conn(self):
+        """Cerrar la conexión actual (llamar con _smtp_lock adquirido)"""
+        if self._smtp is not None and self._smtp.is_connected:
+            try:
+                await self._smtp.quit()
+            except Exception as e:
+                print(f"Error cerrando conexión SMTP: {e}")
+        self._smtp = None
+
     async def send_priority_email(self, subject: str, html_body: str, recipients: List[str]):
         """Enviar email prioritario para errores críticos"""
         await self.send_email(f"🔥 URGENT: {subject}", html_body, recipients)
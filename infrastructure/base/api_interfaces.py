@@ -3,7 +3,7 @@
 Interfaces para clientes de API externa
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Tuple
+from typing import AsyncIterator, List, Dict, Tuple
 from datetime import datetime
 
 
@@ -11,13 +11,13 @@ class IAmazonAPIClient(ABC):
     """Interface para cliente de Amazon SP-API"""
 
     @abstractmethod
-    async def get_orders_paginated(
+    def iter_orders_paginated(
         self,
         date_from: datetime,
         date_to: datetime,
         markets: List[str]
-    ) -> List[Dict]:
-        """Obtener órdenes con paginación automática"""
+    ) -> AsyncIterator[List[Dict]]:
+        """Iterar órdenes página a página sin materializar el periodo completo"""
         pass
 
     @abstractmethod
@@ -1,6 +1,7 @@
 """
 Clase base para servicios asíncronos - elimina código duplicado
 """
+import asyncio
 import logging
 from abc import ABC
 from contextlib import asynccontextmanager
@@ -39,24 +40,28 @@ class AsyncService(ABC):
 
         self.logger.info(f"Iniciando {self.__class__.__name__}")
 
+        # Los handshakes (TCP + auth) de cada recurso son independientes:
+        # se lanzan todos a la vez en lugar de uno tras otro
+        steps = []
         for dep in self._dependencies:
+            name = dep.__class__.__name__
+
             # Inicializar pool principal si existe
             if hasattr(dep, 'init_pool'):
-                await dep.init_pool()
-                self.logger.debug(
-                    f"Pool inicializado para {dep.__class__.__name__}")
+                steps.append(self._run_lifecycle_step(
+                    dep.init_pool(), f"Pool inicializado para {name}"))
 
             # Inicializar pool secundario (Prestashop) si existe
             if hasattr(dep, 'init_prestashop_pool'):
-                await dep.init_prestashop_pool()
-                self.logger.debug(
-                    f"Pool Prestashop inicializado para {dep.__class__.__name__}")
+                steps.append(self._run_lifecycle_step(
+                    dep.init_prestashop_pool(), f"Pool Prestashop inicializado para {name}"))
 
             # Inicializar cliente de email si existe
             if hasattr(dep, '_init_email_client'):
-                await dep._init_email_client()
-                self.logger.debug(
-                    f"Email client inicializado para {dep.__class__.__name__}")
+                steps.append(self._run_lifecycle_step(
+                    dep._init_email_client(), f"Email client inicializado para {name}"))
+
+        await asyncio.gather(*steps)
 
         self._initialized = True
         self.logger.info(
@@ -69,22 +74,48 @@ class AsyncService(ABC):
 
         self.logger.info(f"Finalizando {self.__class__.__name__}")
 
-        for dep in reversed(self._dependencies):  # Cerrar en orden inverso
+        # Ninguna dependencia usa a otra al cerrarse: cierre concurrente
+        steps = []
+        for dep in self._dependencies:
+            name = dep.__class__.__name__
+
             # Cerrar pool principal
             if hasattr(dep, 'close_pool'):
-                await dep.close_pool()
-                self.logger.debug(
-                    f"Pool cerrado para {dep.__class__.__name__}")
+                steps.append(self._run_lifecycle_step(
+                    dep.close_pool(), f"Pool cerrado para {name}"))
 
             # Cerrar pool secundario
             if hasattr(dep, 'close_pool_prestashop'):
-                await dep.close_pool_prestashop()
-                self.logger.debug(
-                    f"Pool Prestashop cerrado para {dep.__class__.__name__}")
+                steps.append(self._run_lifecycle_step(
+                    dep.close_pool_prestashop(), f"Pool Prestashop cerrado para {name}"))
+
+            # Cerrar conexión SMTP del cliente de email
+            if hasattr(dep, '_close_email_client'):
+                steps.append(self._run_lifecycle_step(
+                    dep._close_email_client(), f"Email client cerrado para {name}"))
+
+            # Vaciar el log CSV de eventos pendiente de escribir
+            if hasattr(dep, '_close_event_log'):
+                steps.append(self._run_lifecycle_step(
+                    dep._close_event_log(), f"Log de eventos cerrado para {name}"))
+
+        # Escribir las métricas pendientes del servicio y de sus dependencias
+        for owner in (self, *self._dependencies):
+            metrics = getattr(owner, 'metrics', None)
+            if hasattr(metrics, 'close'):
+                steps.append(self._run_lifecycle_step(
+                    metrics.close(), f"Métricas escritas para {owner.__class__.__name__}"))
+
+        await asyncio.gather(*steps)
 
         self._initialized = False
         self.logger.info(f"{self.__class__.__name__} finalizado correctamente")
 
+    async def _run_lifecycle_step(self, step, message: str) -> None:
+        """Esperar un paso de inicialización/cierre y registrarlo"""
+        await step
+        self.logger.debug(message)
+
     @asynccontextmanager
     async def lifecycle(self):
         """
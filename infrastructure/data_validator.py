@@ -1,13 +1,42 @@
 """
 Validador de datos refactorizado usando Chain of Responsibility
 """
+import asyncio
+import hashlib
 import logging
+from itertools import repeat
+
+import numpy as np
 import pandas as pd
 from typing import List, Tuple
 
 from infrastructure.validation.validation_chain_builder import ValidationChainBuilder
+from infrastructure.validation.validation_chain import hash_column_for, hash_keys
 from infrastructure.error_handling import EnhancedErrorHandler
 
+# Campos críticos que pueden cambiar (en el orden del hash de MySQL)
+_CHANGE_FIELDS = (
+    'isAmazonInvoiced',
+    'isBuyerRequestedCancellation',
+    'buyerRequestedCancelReason'
+)
+
+
+def _field_text(value) -> str:
+    """
+    Texto de un campo tal como lo produce COALESCE(CAST(... AS CHAR), '') en MySQL
+
+    Los nulos se representan como cadena vacía, igual que en MySQL: un
+    cambio entre NULL y '' no se detecta como modificación.
+    """
+    if value is None or pd.isna(value):
+        return ''
+    if isinstance(value, (bool, np.bool_)):
+        return str(int(value))
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
 
 class DataValidator:
     """
@@ -15,6 +44,9 @@ class DataValidator:
     Ahora es mucho más simple y componible
     """
 
+    # Claves por consulta de existencia (las consultas se lanzan en paralelo)
+    EXISTING_KEYS_CHUNK_SIZE = 5000
+
     def __init__(self, db_manager):
         EnhancedErrorHandler()
         self.db_manager = db_manager
@@ -59,6 +91,10 @@ class DataValidator:
                     'shippingPrice', 'shippingTax', 'isBusinessOrder',
                     'isAmazonInvoiced', 'isBuyerRequestedCancellation'
                 ])
+                .compact_low_cardinality(
+                    flag_columns=['isAmazonInvoiced', 'isBuyerRequestedCancellation'],
+                    category_columns=['buyerRequestedCancelReason']
+                )
                 .normalize_dates(['purchaseDate', 'paymentsDate'])
                 .generate_keys(['orderId', 'purchaseDate', 'orderItemId'])
                 .remove_duplicates()
@@ -81,31 +117,45 @@ class DataValidator:
         if df.empty:
             return pd.DataFrame(), pd.DataFrame()
 
-        # Obtener registros existentes
-        existing_records = await self.db_manager.order_details.get_existing_order_details(
-            df['unique_key'].tolist()
+        # Obtener claves existentes y hash de sus campos modificables,
+        # en sub-lotes concurrentes para no construir un único IN gigante
+        keys = df['unique_key'].tolist()
+        chunk_size = self.EXISTING_KEYS_CHUNK_SIZE
+        results = await asyncio.gather(*(
+            self.db_manager.order_details.get_existing_change_hashes(
+                keys[i:i + chunk_size])
+            for i in range(0, len(keys), chunk_size)
+        ))
+        # Cada sub-lote infiere su dtype: si todos sus hashes son < 2**63 llega
+        # como int64 y concat con otro uint64 daría float64 (pierde precisión)
+        results = [
+            result.astype({'change_hash': np.uint64})
+            for result in results if not result.empty
+        ]
+        existing_records = (
+            pd.concat(results, ignore_index=True) if results else pd.DataFrame()
         )
 
-        # Determinar qué hacer con cada registro
-        existing_keys = set(
-            existing_records['unique_key'].tolist()
-        ) if not existing_records.empty else set()
-
-        new_keys = set(df['unique_key'].tolist())
+        # Determinar qué hacer con cada registro (un único isin sobre hashes uint64)
+        hash_column = hash_column_for('unique_key')
+        if existing_records.empty:
+            is_new = np.ones(len(df), dtype=bool)
+        elif hash_column in df.columns:
+            existing_hashes = hash_keys(existing_records['unique_key'])
+            is_new = ~df[hash_column].isin(existing_hashes).to_numpy()
+        else:
+            is_new = ~df['unique_key'].isin(existing_records['unique_key']).to_numpy()
 
-        keys_to_insert = new_keys - existing_keys
-        keys_to_update = new_keys & existing_keys
-
-        df_to_insert = df[df['unique_key'].isin(keys_to_insert)].copy()
-        df_to_update = df[df['unique_key'].isin(keys_to_update)].copy()
+        df_to_insert = df[is_new]
+        df_to_update = df[~is_new]
 
         # Para los registros a actualizar, verificar si realmente hay cambios
         if not df_to_update.empty and not existing_records.empty:
             df_to_update = self._filter_actual_changes(
                 df_to_update, existing_records)
 
-        self.logger.info(f"Registros para insertar:   {len(df_to_insert)}")
-        self.logger.info(f"Registros para actualizar: {len(df_to_update)}")
+        self.logger.info("Registros para insertar:   %d", len(df_to_insert))
+        self.logger.info("Registros para actualizar: %d", len(df_to_update))
 
         return df_to_insert, df_to_update
 
@@ -117,43 +167,52 @@ class DataValidator:
         """
         Filtrar solo registros que realmente han cambiado
 
+        Compara el hash de los campos modificables calculado aquí con el
+        calculado por MySQL (change_hash), sin traer los valores de la BD.
+
         Args:
             df_new: DataFrame con datos nuevos
-            df_existing: DataFrame con datos existentes
+            df_existing: DataFrame con unique_key y change_hash existentes
 
         Returns:
             DataFrame con solo los registros que cambiaron
         """
-        # Campos críticos que pueden cambiar
-        change_fields = [
-            'isAmazonInvoiced',
-            'isBuyerRequestedCancellation',
-            'buyerRequestedCancelReason'
-        ]
+        # Alinear cada fila nueva con su hash existente por unique_key
+        existing_unique = df_existing.drop_duplicates('unique_key')
+        positions = pd.Index(existing_unique['unique_key']).get_indexer(
+            df_new['unique_key'])
+        found = positions >= 0
+
+        existing_hashes = existing_unique['change_hash'].to_numpy(dtype=np.uint64)[positions]
+        changed_mask = found & (self._change_hashes(df_new) != existing_hashes)
+
+        # Detalle solo si alguien lo va a leer: evita formatear las claves en INFO
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Registros con cambios (%d de %d): %s",
+                changed_mask.sum(), len(df_new),
+                df_new['unique_key'][changed_mask].tolist()
+            )
+
+        return df_new[changed_mask]
+
+    def _change_hashes(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Hash de los campos modificables con el mismo formato que MySQL
 
-        merged = df_new.merge(
-            df_existing,
-            on='unique_key',
-            suffixes=('_new', '_existing')
+        Primeros 64 bits del MD5 de los campos unidos por '|', con nulos como
+        cadena vacía y flags numéricos como entero ("1", no "1.0").
+        """
+        columns = [
+            df[field] if field in df.columns else repeat(None)
+            for field in _CHANGE_FIELDS
+        ]
+        return np.fromiter(
+            (
+                int.from_bytes(hashlib.md5(
+                    '|'.join(map(_field_text, values)).encode('utf-8')).digest()[:8], 'big')
+                for values in zip(*columns)
+            ),
+            dtype=np.uint64,
+            count=len(df)
         )
-
-        changed_mask = pd.Series([False] * len(merged))
-
-        for field in change_fields:
-            new_col = f'{field}_new'
-            existing_col = f'{field}_existing'
-
-            if new_col in merged.columns and existing_col in merged.columns:
-                # Comparar valores
-                both_not_null = ~merged[new_col].isna(
-                ) & ~merged[existing_col].isna()
-                values_different = merged[new_col] != merged[existing_col]
-                one_is_null = merged[new_col].isna(
-                ) != merged[existing_col].isna()
-
-                field_changes = (
-                    both_not_null & values_different) | one_is_null
-                changed_mask |= field_changes
-
-        changed_keys = merged[changed_mask]['unique_key'].tolist()
-        return df_new[df_new['unique_key'].isin(changed_keys)]
@@ -3,6 +3,7 @@ Decorador para retry automático con backoff exponencial
 """
 import asyncio
 import logging
+import time
 from functools import wraps
 from typing import Tuple, Type, Callable, Any
 
@@ -10,6 +11,19 @@ from typing import Tuple, Type, Callable, Any
 logger = logging.getLogger(__name__)
 
 
+def _log_max_retries(func: Callable, max_retries: int, retry_count: int,
+                     error: Exception) -> None:
+    """Registrar que se agotaron los reintentos de una función async"""
+    logger.error(
+        f"{func.__name__}: Máximo de reintentos ({max_retries}) alcanzado",
+        extra={
+            'function': func.__name__,
+            'retry_count': retry_count + 1,
+            'error': str(error)
+        }
+    )
+
+
 def async_retry(
     max_retries: int = 3,
     backoff_base: int = 2,
@@ -31,7 +45,22 @@ def async_retry(
             # código que puede fallar
             pass
     """
+    # Esperas entre intentos calculadas una sola vez (backoff_base^retry_count)
+    waits = tuple(backoff_base ** i for i in range(max_retries - 1))
+
     def decorator(func: Callable) -> Callable:
+        if max_retries == 1:
+            # Sin reintentos: un único intento, sin bucle ni estado por llamada
+            @wraps(func)
+            async def single_attempt(*args, **kwargs) -> Any:
+                try:
+                    return await func(*args, **kwargs)
+                except exceptions as e:
+                    _log_max_retries(func, max_retries, 0, e)
+                    raise
+
+            return single_attempt
+
         @wraps(func)
         async def wrapper(*args, **kwargs) -> Any:
             last_exception = None
@@ -45,18 +74,10 @@ def async_retry(
 
                     # Si es el último intento, re-raise
                     if retry_count == max_retries - 1:
-                        logger.error(
-                            f"{func.__name__}: Máximo de reintentos ({max_retries}) alcanzado",
-                            extra={
-                                'function': func.__name__,
-                                'retry_count': retry_count + 1,
-                                'error': str(e)
-                            }
-                        )
+                        _log_max_retries(func, max_retries, retry_count, e)
                         raise
 
-                    # Calcular tiempo de espera
-                    wait_time = backoff_base ** retry_count
+                    wait_time = waits[retry_count]
 
                     logger.warning(
                         f"{func.__name__}: Intento {retry_count + 1}/{max_retries} falló. "
@@ -103,10 +124,24 @@ def sync_retry(
             # código que puede fallar
             pass
     """
+    waits = tuple(backoff_base ** i for i in range(max_retries - 1))
+
     def decorator(func: Callable) -> Callable:
+        if max_retries == 1:
+            @wraps(func)
+            def single_attempt(*args, **kwargs) -> Any:
+                try:
+                    return func(*args, **kwargs)
+                except exceptions:
+                    logger.error(
+                        f"{func.__name__}: Máximo de reintentos alcanzado"
+                    )
+                    raise
+
+            return single_attempt
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            import time
             last_exception = None
 
             for retry_count in range(max_retries):
@@ -122,7 +157,7 @@ def sync_retry(
                         )
                         raise
 
-                    wait_time = backoff_base ** retry_count
+                    wait_time = waits[retry_count]
                     logger.warning(
                         f"{func.__name__}: Reintentando en {wait_time}s..."
                     )
@@ -4,6 +4,7 @@ Dependency Injection Container
 Gestiona creación y ciclo de vida de dependencias
 """
 import logging
+import threading
 from typing import Dict, Any, Type, Callable
 
 from core.database_manager import DatabaseManager
@@ -34,9 +35,13 @@ class DependencyContainer:
     """
 
     def __init__(self):
-        self._services: Dict[str, Any] = {}
-        self._factories: Dict[str, Callable] = {}
-        self._singletons: Dict[str, Any] = {}
+        # Claves: la propia clase del servicio (hash por identidad, sin formatear strings)
+        self._services: Dict[Type, Callable] = {}
+        self._factories: Dict[Type, Callable] = {}
+        self._singletons: Dict[Type, Any] = {}
+        # Solo protege la creación de singletons; la lectura de uno ya creado
+        # no toma el lock. Reentrante: una factory puede resolver otras dependencias
+        self._lock = threading.RLock()
         # self.logger = logging.getLogger("AmazonManagement")
         self.logger = logging.getLogger(self.__class__.__name__)
 
@@ -48,9 +53,8 @@ class DependencyContainer:
             interface: Clase o tipo del servicio
             factory: Función que crea la instancia
         """
-        key = self._get_key(interface)
-        self._factories[key] = factory
-        self.logger.debug(f"Registered singleton: {key}")
+        self._factories[interface] = factory
+        self.logger.debug("Registered singleton: %s.%s", interface.__module__, interface.__name__)
 
     def register_transient(self, interface: Type, factory: Callable) -> None:
         """
@@ -60,9 +64,8 @@ class DependencyContainer:
             interface: Clase o tipo del servicio
             factory: Función que crea la instancia
         """
-        key = self._get_key(interface)
-        self._services[key] = factory
-        self.logger.debug(f"Registered transient: {key}")
+        self._services[interface] = factory
+        self.logger.debug("Registered transient: %s.%s", interface.__module__, interface.__name__)
 
     def resolve(self, interface: Type) -> Any:
         """
@@ -77,36 +80,51 @@ class DependencyContainer:
         Raises:
             KeyError: Si el servicio no está registrado
         """
-        key = self._get_key(interface)
-
         # Verificar si es singleton ya creado
-        if key in self._singletons:
-            return self._singletons[key]
-
-        # Crear singleton si tiene factory
-        if key in self._factories:
-            instance = self._factories[key](self)
-            self._singletons[key] = instance
-            self.logger.debug(f"Created singleton: {key}")
+        instance = self._singletons.get(interface)
+        if instance is not None:
+            return instance
+
+        # Crear singleton si tiene factory (doble comprobación bajo lock)
+        factory = self._factories.get(interface)
+        if factory is not None:
+            with self._lock:
+                instance = self._singletons.get(interface)
+                if instance is None:
+                    instance = self._singletons.setdefault(interface, factory(self))
+                    self.logger.debug("Created singleton: %s.%s",
+                                      interface.__module__, interface.__name__)
             return instance
 
         # Crear transient
-        if key in self._services:
-            instance = self._services[key](self)
-            self.logger.debug(f"Created transient: {key}")
+        factory = self._services.get(interface)
+        if factory is not None:
+            instance = factory(self)
+            self.logger.debug("Created transient: %s.%s", interface.__module__, interface.__name__)
             return instance
 
-        raise KeyError(f"Service not registered: {key}")
+        raise KeyError(
+            f"Service not registered: {interface.__module__}.{interface.__name__}")
 
-    def _get_key(self, interface: Type) -> str:
-        """Obtener clave string para el servicio"""
-        return f"{interface.__module__}.{interface.__name__}"
+    def warm_up(self) -> None:
+        """
+        Crear por adelantado todos los singletons registrados
+
+        Pensado para procesos de larga duración: tras llamarlo, cada resolve
+        de un singleton es una única lectura del diccionario.
+        """
+        for interface in list(self._factories):
+            self.resolve(interface)
 
     @classmethod
-    def create_production_container(cls) -> 'DependencyContainer':
+    def create_production_container(cls, eager: bool = False) -> 'DependencyContainer':
         """
         Factory method para crear container con dependencias de producción
 
+        Args:
+            eager: Si es True, crea todos los singletons al construir el container.
+                   Por defecto se crean bajo demanda (la CLI solo usa uno por modo)
+
         Returns:
             Container configurado para producción
         """
@@ -210,6 +228,9 @@ class DependencyContainer:
             lambda c: FileProcessor()
         )
 
+        if eager:
+            container.warm_up()
+
         container.logger.info("Production container configured")
         return container
 
@@ -1,12 +1,20 @@
+import asyncio
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
+import time
 import traceback
+import uuid
 import config.setting as st
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any
-import aiofiles
+from functools import partial
+from typing import Dict, Any, Callable, List
 from infrastructure.metrics_collector import MetricsCollector
 from pathlib import Path
+from string import Template
 from models.error_models import AlertLevel, ErrorCategory, ErrorContext
 
 
@@ -18,8 +26,263 @@ FUNCIONALIDAD:
 - Previene spam de emails
 """
 
+# Listener que escribe los logs en un hilo aparte (uno por proceso)
+_log_listener = None
+
+
+def _stop_log_listener():
+    """Detener el listener activo: vacía la cola y cierra sus handlers"""
+    global _log_listener
+    if _log_listener is None:
+        return
+    _log_listener.stop()
+    for handler in _log_listener.handlers:
+        handler.close()
+    _log_listener = None
+
+
+atexit.register(_stop_log_listener)
+
+
+class _BufferedFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler que escribe en bloques en lugar de volcar cada registro
+
+    Vuelca al disco ante un registro ERROR o superior, o si han pasado
+    FLUSH_INTERVAL segundos desde el último volcado; al cerrarse vuelca el resto.
+    El tamaño para rotar se lleva en memoria (en caracteres, aproximado) para
+    no forzar un volcado con seek/tell en cada registro.
+    """
+
+    BUFFER_SIZE = 64 * 1024
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, *args, **kwargs):
+        self._last_flush = time.monotonic()
+        self._size = 0
+        super().__init__(*args, **kwargs)
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode, buffering=self.BUFFER_SIZE,
+                      encoding=self.encoding, errors=self.errors)
+        self._size = stream.tell()
+        return stream
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self._size and self._size + len(msg) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(msg)
+            self._size += len(msg)
+
+            now = time.monotonic()
+            if record.levelno >= logging.ERROR or now - self._last_flush >= self.FLUSH_INTERVAL:
+                self.stream.flush()
+                self._last_flush = now
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class _CachedTimeFormatter(logging.Formatter):
+    """
+    Formatter que reutiliza el asctime formateado dentro del mismo segundo
+
+    Solo se llama a strftime una vez por segundo; los milisegundos se añaden
+    a cada registro.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (segundo, texto): una sola tupla para que la lectura sea atómica
+        self._cached_time = (None, '')
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached_second, text = self._cached_time
+        if second != cached_second:
+            text = time.strftime(datefmt or self.default_time_format,
+                                 self.converter(second))
+            self._cached_time = (second, text)
+        if datefmt:
+            return text
+        return self.default_msec_format % (text, record.msecs)
+
+
+# Log CSV de eventos: separador ';' y comillas solo cuando hacen falta
+_CSV_FIELDS = ('event_date', 'event_class', 'event_desc', 'event_file',
+               'event_line', 'file_or_reason', 'category', 'level')
+_CSV_SPECIAL_CHARS = frozenset(';"\r\n')
+
+
+def _csv_field(value) -> str:
+    """Escapar un valor para el log CSV"""
+    text = str(value)
+    if _CSV_SPECIAL_CHARS.isdisjoint(text):
+        return text
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _csv_line(values) -> bytes:
+    """Línea CSV completa, codificada en UTF-8"""
+    return (';'.join(map(_csv_field, values)) + '\n').encode('utf-8')
+
+
+_CSV_HEADER = _csv_line(_CSV_FIELDS)
+
+
+# Plantillas HTML de los emails: se construyen una vez al importar el módulo
+_CRITICAL_COLOR = '#d32f2f'
+_WARNING_COLOR = '#f57c00'
+
+_MODE_FRAGMENT = "<p><strong>Modo:</strong> {}</p>"
+_MARKET_FRAGMENT = "<p><strong>Mercado:</strong> {}</p>"
+_FILE_FRAGMENT = "<p><strong>Archivo:</strong> {}</p>"
+_CONTEXT_FRAGMENT = "<p><strong>Contexto adicional:</strong> {}</p>"
+_REPEAT_FRAGMENT = "<p><strong>Repeticiones omitidas:</strong> {} (entre {} y {})</p>"
+
+_ERROR_TEMPLATE = Template("""
+        <html>
+        <body style="font-family: Arial, sans-serif;">
+            <div style="max-width: 800px; margin: 0 auto;">
+                <h2 style="color: ${color};">
+                    ${title}
+                </h2>
+                
+                <div style="background: #f5f5f5; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <h3>📋 Detalles del Error</h3>
+                    <p><strong>Tipo:</strong> ${error_type}</p>
+                    <p><strong>Mensaje:</strong> ${error_message}</p>
+                    <p><strong>Archivo:</strong> ${file_name}:${line_number}</p>
+                    <p><strong>Función:</strong> ${function_name}</p>
+                    <p><strong>Categoría:</strong> ${category}</p>
+                    <p><strong>Nivel:</strong> ${level}</p>
+                    <p><strong>Timestamp:</strong> ${timestamp}</p>
+                    ${mode_block}
+                    ${market_block}
+                    ${repeat_block}
+                </div>
+                
+                <div style="background: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <h3>🔧 Datos Adicionales</h3>
+                    <pre style="background: #f8f9fa; padding: 10px; border-radius: 4px; overflow-x: auto;">
+                        ${additional_data}
+                    </pre>
+                </div>
+                
+                <div style="background: #f8d7da; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <h3>📊 Stack Trace</h3>
+                    <p><strong>trace_id:</strong> ${trace_id} (traza completa en logs/critical_errors.log)</p>
+                    <pre style="background: #f8f9fa; padding: 10px; border-radius: 4px; overflow-x: auto; font-size: 12px;">
+                        ${stack_trace}
+                    </pre>
+                </div>
+                
+                <div style="margin-top: 30px; padding: 20px; background: #e3f2fd; border-radius: 8px;">
+                    <h3>🔍 Acciones Sugeridas</h3>
+                    ${suggested_actions}
+                </div>
+
+                <p style="margin-top: 20px; color: #666;">
+                Powered by Amazon Orders Processor | ${generated_at}
+            </p>
+            </div>
+        </body>
+        </html>
+        """)
+
+_WARNING_TEMPLATE = Template("""
+                <html>
+                <body style="font-family: Arial, sans-serif;">
+                    <div style="max-width: 800px; margin: 0 auto;">
+                        <h2 style="color: #f57c00;">
+                            ⚠️ Warning en Amazon Management
+                        </h2>
+                        
+                        <div style="background: #f5f5f5; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                            <h3>📋 Detalles de advertencia</h3>
+                            <p><strong>Mensaje:</strong> ${message}</p>
+                            <p><strong>Proceso:</strong> ${process_mode}</p>
+                            <p><strong>Timestamp:</strong> ${timestamp}</p>
+                            
+                            ${file_block}
+                            ${context_block}
+
+                        </div>
+
+                        <p style="margin-top: 20px; color: #666;">
+                            Powered by Amazon Orders Processor | ${generated_at}
+                        </p>
+                    </div>
+                </body>
+                </html>
+        """)
+
+_SUGGESTED_ACTIONS = {
+    ErrorCategory.API_ERROR: """
+                <ul>
+                    <li>Verificar rate limits de Amazon SP-API</li>
+                    <li>Revisar credenciales de API</li>
+                    <li>Comprobar conectividad</li>
+                </ul>
+            """,
+    ErrorCategory.DATABASE_ERROR: """
+                <ul>
+                    <li>Verificar conexión a base de datos</li>
+                    <li>Revisar espacio en disco</li>
+                    <li>Comprobar permisos de usuario</li>
+                </ul>
+            """,
+    ErrorCategory.PROCESSING_ERROR: """
+                <ul>
+                    <li>Revisar formato de datos</li>
+                    <li>Verificar lógica de negocio</li>
+                    <li>Comprobar transformaciones</li>
+                </ul>
+            """
+}
+_DEFAULT_SUGGESTED_ACTIONS = "<p>Revisar logs para más detalles</p>"
+
 
 class EnhancedErrorHandler:
+    # Log CSV de eventos: una tarea escribe por lotes desde una cola
+    CSV_LOG_FILE = 'info_event_log.csv'
+    CSV_QUEUE_SIZE = 10000
+    CSV_BATCH_SIZE = 256
+    CSV_BUFFER_SIZE = 64 * 1024
+    # Categoría y nivel de alerta según el nombre del tipo de excepción
+    ERROR_CATEGORY_MAP = {
+        'SellingApiException': ErrorCategory.API_ERROR,
+        'DatabaseError': ErrorCategory.DATABASE_ERROR,
+        'ConnectionError': ErrorCategory.DATABASE_ERROR,
+        'ProcessingError': ErrorCategory.PROCESSING_ERROR,
+        'SystemError': ErrorCategory.SYSTEM_ERROR,
+        'FileNotFoundError': ErrorCategory.SYSTEM_ERROR,
+        'PermissionError': ErrorCategory.SYSTEM_ERROR,
+    }
+    CRITICAL_ERRORS = frozenset(('DatabaseError', 'ConnectionError', 'AuthenticationError'))
+    WARNING_ERRORS = frozenset(('SellingApiException', 'RateLimitError'))
+    # Emails de notificación pendientes de envío (los envía una tarea aparte)
+    EMAIL_QUEUE_SIZE = 1000
+    # Ventana anti-spam: un email por tipo/categoría de error cada 30 minutos
+    NOTIFICATION_COOLDOWN_SECONDS = 1800
+    # Nivel de logging para cada nivel de alerta
+    LOG_LEVELS = {
+        AlertLevel.CRITICAL: logging.CRITICAL,
+        AlertLevel.ERROR: logging.ERROR,
+        AlertLevel.WARNING: logging.WARNING,
+        AlertLevel.INFO: logging.INFO,
+    }
+    # Rotación de general.log y critical_errors.log
+    LOG_MAX_BYTES = 10 * 1024 * 1024
+    LOG_BACKUP_COUNT = 5
+
     def __init__(self):
         self.logs_dir = Path("logs")
         self.logs_dir.mkdir(exist_ok=True)
@@ -27,17 +290,41 @@ class EnhancedErrorHandler:
         self.email_client = None
         self._email_initialized = False
         self.metrics = MetricsCollector()
-        self._recent_notifications = {}
+        # clave -> instante (monotonic) del último aviso, del más antiguo al más reciente
+        self._recent_notifications: OrderedDict[str, float] = OrderedDict()
+        # clave -> [repeticiones omitidas, primera, última]; se informa en el siguiente email
+        self._suppressed_notifications: Dict[str, list] = {}
+        # La tarea escritora se crea con el primer evento (el handler puede
+        # construirse fuera del event loop)
+        self._csv_queue: asyncio.Queue = asyncio.Queue(maxsize=self.CSV_QUEUE_SIZE)
+        self._csv_task = None
+        # True tras _close_event_log: las líneas se escriben directamente
+        self._csv_closed = False
+        self._email_queue: asyncio.Queue = asyncio.Queue(maxsize=self.EMAIL_QUEUE_SIZE)
+        self._email_task = None
+        # True tras _close_email_client: ya no hay quien vacíe la cola y los
+        # emails se envían directamente (como antes de la cola)
+        self._email_closed = False
 
     def _setup_logger(self):
-        """Configurar logging estructurado"""
+        """
+        Configurar logging estructurado
+
+        El logger solo encola los registros (QueueHandler); un QueueListener
+        los escribe en consola y ficheros desde un hilo propio, sin bloquear
+        el event loop.
+        """
         logger = logging.getLogger('AmazonManagement')
         logger.setLevel(logging.DEBUG)
         for handler in logger.handlers[:]:
             logger.removeHandler(handler)
+        # Cada instancia reconfigura el logger: el listener anterior se cierra
+        _stop_log_listener()
+
+        handlers = []
 
         # Formato estructurado
-        formatter = logging.Formatter(
+        formatter = _CachedTimeFormatter(
             '%(asctime)s | %(levelname)s | %(filename)s:%(funcName)s:%(lineno)d | %(message)s'
         )
 
@@ -48,34 +335,45 @@ class EnhancedErrorHandler:
         stdout_handler.setFormatter(formatter)
         # Filtro para que solo INFO y DEBUG vayan a stdout
         stdout_handler.addFilter(lambda record: record.levelno <= logging.INFO)
-        logger.addHandler(stdout_handler)
+        handlers.append(stdout_handler)
 
         # Handler para STDERR (WARNING, ERROR, CRITICAL)
         stderr_handler = logging.StreamHandler(sys.stderr)
         stderr_handler.setLevel(logging.WARNING)
         stderr_handler.setFormatter(formatter)
-        logger.addHandler(stderr_handler)
+        handlers.append(stderr_handler)
 
-        # 2. Handler para archivo general
+        # 2. Handler para archivo general (escritura en bloques: es el de más volumen)
         try:
-            file_handler = logging.FileHandler(
-                self.logs_dir / 'general.log', encoding='utf-8')
+            file_handler = _BufferedFileHandler(
+                self.logs_dir / 'general.log', maxBytes=self.LOG_MAX_BYTES,
+                backupCount=self.LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
             file_handler.setLevel(logging.INFO)
             file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
+            handlers.append(file_handler)
         except Exception as e:
             print(f"❌ Error al crear el gestor de archivos: {e}")
 
         # 3. Handler para errores críticos
         try:
-            error_handler = logging.FileHandler(
-                self.logs_dir / 'critical_errors.log', encoding='utf-8')
+            error_handler = logging.handlers.RotatingFileHandler(
+                self.logs_dir / 'critical_errors.log', maxBytes=self.LOG_MAX_BYTES,
+                backupCount=self.LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
             error_handler.setLevel(logging.ERROR)
             error_handler.setFormatter(formatter)
-            logger.addHandler(error_handler)
+            handlers.append(error_handler)
         except Exception as e:
             print(f"❌ Error al crear el gestor de archivos: {e}")
 
+        # 4. El logger solo encola; el listener aplica nivel y filtros de cada handler
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+        global _log_listener
+        _log_listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True)
+        _log_listener.start()
+
         # Evitar propagación a root logger
         logger.propagate = False
 
@@ -94,6 +392,70 @@ class EnhancedErrorHandler:
                     f"❌ Error al iniciar el cliente de Email: {e}")
                 self.email_client = None
 
+    async def _close_email_client(self):
+        """Enviar los emails pendientes y cerrar la conexión SMTP reutilizada"""
+        if self._email_task is not None and not self._email_task.done():
+            await self._email_queue.put(None)
+            await self._email_task
+        self._email_task = None
+        self._email_closed = True
+
+        if self.email_client:
+            await self.email_client.close()
+
+    async def _queue_email(self, subject: str, render: Callable[[], str], recipients: List[str],
+                           priority: bool = False):
+        """
+        Encolar un email de notificación
+
+        handle_error no espera al servidor SMTP ni genera el HTML: _email_worker
+        llama a `render` fuera del event loop y envía los emails en orden por
+        la conexión persistente del cliente.
+
+        Tras _close_email_client (p.ej. el error fatal que los servicios
+        gestionan fuera de lifecycle) el email se envía directamente: una
+        tarea nueva se cancelaría al terminar el proceso sin enviarlo.
+        """
+        if self._email_closed:
+            await self._deliver_email(subject, render, recipients, priority)
+            if self.email_client:
+                await self.email_client.close()
+            return
+
+        if self._email_task is None or self._email_task.done():
+            self._email_task = asyncio.create_task(self._email_worker())
+        await self._email_queue.put((subject, render, recipients, priority))
+
+    async def _email_worker(self):
+        """Enviar los emails encolados hasta recibir None"""
+        item = None
+        try:
+            while (item := await self._email_queue.get()) is not None:
+                await self._deliver_email(*item)
+                item = None
+        except asyncio.CancelledError:
+            # Cierre del event loop: enviar el email en curso y lo que quede
+            pending = [item] if item is not None else []
+            while not self._email_queue.empty():
+                pending.append(self._email_queue.get_nowait())
+            for item in pending:
+                if item is not None:
+                    await self._deliver_email(*item)
+            raise
+
+    async def _deliver_email(self, subject: str, render: Callable[[], str],
+                             recipients: List[str], priority: bool):
+        """Generar y enviar un email encolado (los errores no detienen la cola)"""
+        try:
+            # El HTML incluye la traza (formatearla lee el código fuente): en un hilo
+            html_body = await asyncio.to_thread(render)
+            if priority:
+                await self.email_client.send_priority_email(subject, html_body, recipients)
+            else:
+                await self.email_client.send_email(subject, html_body, recipients)
+        except Exception as email_error:
+            self.logger.info(f"📧 El envio de notificacion: {email_error}")
+
     async def handle_error(self, error: Exception, context: Dict[str, Any] = None):
         """Manejo centralizado de errores"""
 
@@ -103,7 +465,10 @@ class EnhancedErrorHandler:
             # 1. Log estructurado
             await self._log_error(error_context)
 
-            # 2. Métricas
+            # 2. Log CSV de eventos
+            await self._log_to_csv(error_context)
+
+            # 3. Métricas
             try:
 
                 await self.metrics.record_process_error(error_context)
@@ -111,12 +476,14 @@ class EnhancedErrorHandler:
                 self.logger.warning(
                     f"Fallo en el registro de métricas: {metrics_error}")
 
-            # 3. Notificación por email (si aplica)
+            # 4. Notificación por email (si aplica)
             if self._should_send_email(error_context):
                 await self._send_error_notification(error_context)
 
-            # 4. Alertas adicionales para errores críticos
-            if error_context.level == AlertLevel.CRITICAL:
+            # 5. Alertas adicionales para errores críticos (con su propia
+            # ventana anti-spam: una caída de BD no genera un email por error)
+            if (error_context.level == AlertLevel.CRITICAL and
+                    self._notification_allowed(error_context, channel='critical')):
                 await self._send_critical_alert(error_context)
 
         except Exception as handler_error:
@@ -162,106 +529,194 @@ class EnhancedErrorHandler:
             level=self._determine_alert_level(error),
             timestamp=datetime.now(),
             additional_data=context or {},
-            stack_trace=traceback.format_exc(),
+            exception=error,
+            trace_id=uuid.uuid4().hex[:12],
             process_mode=context.get('process_mode') if context else None,
             market_id=context.get('market_id') if context else None
         )
 
     def _categorize_error(self, error: Exception) -> ErrorCategory:
         """Categorizar el error automáticamente"""
-        error_mappings = {
-            'SellingApiException': ErrorCategory.API_ERROR,
-            'DatabaseError': ErrorCategory.DATABASE_ERROR,
-            'ConnectionError': ErrorCategory.DATABASE_ERROR,
-            'ProcessingError': ErrorCategory.PROCESSING_ERROR,
-            'SystemError': ErrorCategory.SYSTEM_ERROR,
-            'FileNotFoundError': ErrorCategory.SYSTEM_ERROR,
-            'PermissionError': ErrorCategory.SYSTEM_ERROR,
-        }
-
-        error_type = type(error).__name__
-        return error_mappings.get(error_type, ErrorCategory.SYSTEM_ERROR)
+        return self.ERROR_CATEGORY_MAP.get(type(error).__name__, ErrorCategory.SYSTEM_ERROR)
 
     def _determine_alert_level(self, error: Exception) -> AlertLevel:
         """Determinar nivel de alerta"""
-        critical_errors = ['DatabaseError',
-                           'ConnectionError', 'AuthenticationError']
-        warning_errors = ['SellingApiException', 'RateLimitError']
-
         error_type = type(error).__name__
 
-        if error_type in critical_errors:
+        if error_type in self.CRITICAL_ERRORS:
             return AlertLevel.CRITICAL
-        elif error_type in warning_errors:
+        elif error_type in self.WARNING_ERRORS:
             return AlertLevel.WARNING
         else:
             return AlertLevel.ERROR
 
     async def _log_error(self, error_context: ErrorContext):
         """Log estructurado del error"""
-        log_message = (
-            f"[{error_context.category.value}] {error_context.error_type}: {error_context.error_message}"
-        )
+        level = self.LOG_LEVELS.get(error_context.level, logging.INFO)
+
+        log_format = "[%s] %s: %s"
+        args = [error_context.category.value, error_context.error_type,
+                error_context.error_message]
 
         if error_context.process_mode:
-            log_message += f" | Mode: {error_context.process_mode}"
+            log_format += " | Mode: %s"
+            args.append(error_context.process_mode)
 
         if error_context.market_id:
-            log_message += f" | Market: {error_context.market_id}"
-
-        # Log según nivel
-        if error_context.level == AlertLevel.CRITICAL:
-            self.logger.critical(log_message)
-            self.logger.critical(f"Stack trace:\n{error_context.stack_trace}")
-            print(f"CRITICAL: {log_message}", file=sys.stderr)
-        elif error_context.level == AlertLevel.ERROR:
-            self.logger.error(log_message)
-            self.logger.debug(f"Stack trace:\n{error_context.stack_trace}")
-            print(f"ERROR: {log_message}", file=sys.stderr)
-        elif error_context.level == AlertLevel.WARNING:
-            self.logger.warning(log_message)
-            print(f"WARNING: {log_message}", file=sys.stderr)
-        else:
-            self.logger.info(log_message)
+            log_format += " | Market: %s"
+            args.append(error_context.market_id)
+
+        # Log según nivel (el handler de stderr ya muestra WARNING y superiores)
+        self.logger.log(level, log_format, *args)
+        # Traza completa una sola vez, bajo el trace_id que muestra el email
+        # (ERROR y CRITICAL llegan también a critical_errors.log). Formatearla
+        # lee el código fuente: solo si el logger va a emitir el registro
+        if level >= logging.ERROR and self.logger.isEnabledFor(level):
+            self.logger.log(level, "Stack trace [%s]:\n%s",
+                            error_context.trace_id, error_context.get_stack_trace())
 
     async def _log_to_csv(self, error_context: ErrorContext):
         """Mantener logging a CSV (compatibilidad)"""
-        log_entry = {
-            'event_date': error_context.timestamp.isoformat(),
-            'event_class': error_context.error_type,
-            'event_desc': error_context.error_message,
-            'event_file': error_context.file_name,
-            'event_line': error_context.line_number,
-            'file_or_reason': error_context.process_mode or 'unknown',
-            'category': error_context.category.value,
-            'level': error_context.level.value
-        }
+        values = (
+            error_context.timestamp.isoformat(),
+            error_context.error_type,
+            error_context.error_message,
+            error_context.file_name,
+            error_context.line_number,
+            error_context.process_mode or 'unknown',
+            error_context.category.value,
+            error_context.level.value
+        )
+
+        # Tras _close_event_log (p.ej. el error fatal que los servicios
+        # gestionan fuera de lifecycle) no hay escritor: una tarea nueva se
+        # cancelaría al terminar el proceso sin llegar a escribir la línea
+        if self._csv_closed:
+            await asyncio.to_thread(self._append_event_log_line, _csv_line(values))
+            return
 
-        # Usar aiofiles para escritura async
-        async with aiofiles.open('logs/info_event_log.csv', 'a') as f:
-            await f.write(f"{log_entry}\n")
+        # Encolar la línea ya codificada: _csv_writer_loop la escribe por lotes
+        if self._csv_task is None or self._csv_task.done():
+            self._csv_task = asyncio.create_task(self._csv_writer_loop())
+        await self._csv_queue.put(_csv_line(values))
+
+    async def _csv_writer_loop(self):
+        """
+        Escribir el log CSV por lotes con un único fichero abierto
+
+        Toma todo lo que haya en la cola (hasta CSV_BATCH_SIZE líneas) y lo
+        escribe en un hilo con un solo write + flush. Termina al recibir None.
+        El fichero se abre en binario: las líneas llegan ya en UTF-8.
+        """
+        f = self._open_event_log_file()
+        try:
+            while True:
+                line = await self._csv_queue.get()
+                batch = []
+                stop = line is None
+                if not stop:
+                    batch.append(line)
+
+                while not stop and len(batch) < self.CSV_BATCH_SIZE:
+                    try:
+                        line = self._csv_queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if line is None:
+                        stop = True
+                    else:
+                        batch.append(line)
+
+                if batch:
+                    await asyncio.to_thread(self._write_csv_batch, f, batch)
+                if stop:
+                    return
+        finally:
+            f.close()
+
+    def _open_event_log_file(self):
+        """Abrir el log CSV en modo append, con cabecera si el fichero es nuevo"""
+        f = open(self.logs_dir / self.CSV_LOG_FILE, 'ab',
+                 buffering=self.CSV_BUFFER_SIZE)
+        if f.tell() == 0:
+            f.write(_CSV_HEADER)
+        return f
+
+    def _append_event_log_line(self, line: bytes):
+        """Escribir una línea abriendo y cerrando el fichero (se ejecuta en un hilo)"""
+        with self._open_event_log_file() as f:
+            f.write(line)
+
+    @staticmethod
+    def _write_csv_batch(f, batch: List[bytes]):
+        """Escribir y volcar un lote de líneas (se ejecuta en un hilo)"""
+        f.writelines(batch)
+        f.flush()
+
+    async def _close_event_log(self):
+        """Vaciar la cola del log CSV y cerrar el fichero"""
+        self._csv_closed = True
+        if self._csv_task is None or self._csv_task.done():
+            return
+        await self._csv_queue.put(None)
+        await self._csv_task
+        self._csv_task = None
 
     def _should_send_email(self, error_context: ErrorContext) -> bool:
         """Determinar si enviar email"""
         # Enviar email para errores y críticos, pero no para warnings repetitivos
-        if error_context.level not in [AlertLevel.ERROR, AlertLevel.CRITICAL]:
+        if error_context.level not in (AlertLevel.ERROR, AlertLevel.CRITICAL):
             return False
 
-        return self._was_recently_notified(error_context)
+        return self._notification_allowed(error_context)
 
-    def _was_recently_notified(self, error_context: ErrorContext) -> bool:
-        """Verificar si ya se notificó recientemente (evitar spam)"""
-        now = datetime.now()
+    def _notification_key(self, error_context: ErrorContext, channel: str = 'error') -> str:
+        """Clave anti-spam de un error para un canal de notificación"""
         key = f"{error_context.error_type}_{error_context.category.value}"
+        return key if channel == 'error' else f"{key}_{channel}"
+
+    def _notification_allowed(self, error_context: ErrorContext, channel: str = 'error') -> bool:
+        """
+        Decidir si se notifica este error por el canal indicado (evitar spam)
 
-        if key in self._recent_notifications:
-            time_diff = now - self._recent_notifications[key]
-            if time_diff.total_seconds() < 1800:  # 30 minutos
-                return False
+        Si se puede, registra el aviso; si no, cuenta la repetición para
+        resumirla en la siguiente notificación.
+        """
+        key = self._notification_key(error_context, channel)
+
+        if self._is_throttled(key):
+            suppressed = self._suppressed_notifications.get(key)
+            if suppressed is None:
+                self._suppressed_notifications[key] = [
+                    1, error_context.timestamp, error_context.timestamp]
+            else:
+                suppressed[0] += 1
+                suppressed[2] = error_context.timestamp
+            return False
 
-        self._recent_notifications[key] = now
+        self._mark_notified(key)
         return True
 
+    def _is_throttled(self, key: str) -> bool:
+        """Verificar si ya se notificó la clave dentro de la ventana (sin registrar nada)"""
+        sent_at = self._recent_notifications.get(key)
+        return (sent_at is not None and
+                time.monotonic() - sent_at < self.NOTIFICATION_COOLDOWN_SECONDS)
+
+    def _mark_notified(self, key: str):
+        """Registrar un aviso enviado y descartar las entradas caducadas"""
+        now = time.monotonic()
+        notifications = self._recent_notifications
+
+        # Descartar por la cabeza las entradas ya caducadas (orden de inserción)
+        while notifications and (
+                now - next(iter(notifications.values())) >= self.NOTIFICATION_COOLDOWN_SECONDS):
+            notifications.popitem(last=False)
+
+        # Reinsertar al final para mantener el orden por instante de aviso
+        notifications.pop(key, None)
+        notifications[key] = now
+
     async def _send_error_notification(self, error_context: ErrorContext):
         """Enviar notificación por email"""
         try:
@@ -274,16 +729,19 @@ class EnhancedErrorHandler:
 
             subject = f"[{error_context.level.value.upper()}] Amazon Management - {error_context.error_type}"
 
-            html_body = self._generate_error_html(error_context)
-
-            await self.email_client.send_email(
+            # El email solo lleva el final de la traza: la completa ya la
+            # registró _log_error bajo el mismo trace_id
+            await self._queue_email(
                 subject=subject,
-                html_body=html_body,
+                render=partial(
+                    self._generate_error_html, error_context,
+                    suppressed=self._suppressed_notifications.pop(
+                        self._notification_key(error_context), None)),
                 recipients=st.setting_email_recipients['errors']
             )
 
             self.logger.info(
-                f"📧 Notificacion de error enviada para {error_context.error_type}")
+                f"📧 Notificacion de error encolada para {error_context.error_type}")
 
         except Exception as email_error:
             self.logger.info(f"📧 El envio de notificacion: {email_error}")
@@ -299,10 +757,14 @@ class EnhancedErrorHandler:
         subject = f"[CRITICAL]: Amazon Manager - {error_context.error_type}"
 
         # Email prioritario
-        await self.email_client.send_priority_email(
+        await self._queue_email(
             subject=subject,
-            html_body=self._generate_critical_html(error_context),
-            recipients=st.setting_email_recipients['critical']
+            render=partial(
+                self._generate_critical_html, error_context,
+                suppressed=self._suppressed_notifications.pop(
+                    self._notification_key(error_context, 'critical'), None)),
+            recipients=st.setting_email_recipients['critical'],
+            priority=True
         )
 
     async def _send_warning_notification(self, message: str, context: Dict[str, Any]):
@@ -316,122 +778,65 @@ class EnhancedErrorHandler:
         subject = f"⚠️ [WARNING]: Amazon Manager"
 
         # Email prioritario
-        await self.email_client.send_priority_email(
+        await self._queue_email(
             subject=subject,
-            html_body=self._generate_warning_html(message, context),
-            recipients=st.setting_email_recipients['warnings']
+            render=partial(self._generate_warning_html, message, context),
+            recipients=st.setting_email_recipients['warnings'],
+            priority=True
         )
 
-    def _generate_critical_html(self, error_context: ErrorContext) -> str:
+    def _generate_critical_html(self, error_context: ErrorContext, suppressed: list = None) -> str:
         """HTML para alertas críticas"""
-        return self._generate_error_html(error_context).replace(
-            "🚨 Error en Amazon Manager",
-            "🔥 ERROR CRITICO en Amazon Manager"
-        )
+        return self._generate_error_html(
+            error_context, title="🔥 ERROR CRITICO en Amazon Management",
+            suppressed=suppressed)
 
     def _generate_warning_html(self, message: str, context: Dict[str, Any]) -> str:
         """HTML para warnings"""
-        return f"""
-                <html>
-                <body style="font-family: Arial, sans-serif;">
-                    <div style="max-width: 800px; margin: 0 auto;">
-                        <h2 style="color: {'#f57c00'};">
-                            ⚠️ Warning en Amazon Management
-                        </h2>
-                        
-                        <div style="background: #f5f5f5; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                            <h3>📋 Detalles de advertencia</h3>
-                            <p><strong>Mensaje:</strong> {message}</p>
-                            <p><strong>Proceso:</strong> {context.get('process_mode', 'unknown')}</p>
-                            <p><strong>Timestamp:</strong> {datetime.now()}</p>
-                            
-                            {f"<p><strong>Archivo:</strong> {context.get('file_path')}</p>" if context.get('file_path') else ""}
-                            {f"<p><strong>Contexto adicional:</strong> {context}</p>" if context else ""}
-
-                        </div>
+        file_path = context.get('file_path')
+        now = datetime.now()
+        return _WARNING_TEMPLATE.substitute(
+            message=message,
+            process_mode=context.get('process_mode', 'unknown'),
+            timestamp=now,
+            file_block=_FILE_FRAGMENT.format(file_path) if file_path else "",
+            context_block=_CONTEXT_FRAGMENT.format(context) if context else "",
+            generated_at=now.isoformat()
+        )
 
-                        <p style="margin-top: 20px; color: #666;">
-                            Powered by Amazon Orders Processor | {datetime.now().isoformat()}
-                        </p>
-                    </div>
-                </body>
-                </html>
+    def _generate_error_html(self, error_context: ErrorContext,
+                             title: str = "🚨 Error en Amazon Management",
+                             suppressed: list = None) -> str:
         """
+        Generar HTML mejorado para el email
 
-    def _generate_error_html(self, error_context: ErrorContext) -> str:
-        """Generar HTML mejorado para el email"""
-        return f"""
-        <html>
-        <body style="font-family: Arial, sans-serif;">
-            <div style="max-width: 800px; margin: 0 auto;">
-                <h2 style="color: {'#d32f2f' if error_context.level == AlertLevel.CRITICAL else '#f57c00'};">
-                    🚨 Error en Amazon Management
-                </h2>
-                
-                <div style="background: #f5f5f5; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3>📋 Detalles del Error</h3>
-                    <p><strong>Tipo:</strong> {error_context.error_type}</p>
-                    <p><strong>Mensaje:</strong> {error_context.error_message}</p>
-                    <p><strong>Archivo:</strong> {error_context.file_name}:{error_context.line_number}</p>
-                    <p><strong>Función:</strong> {error_context.function_name}</p>
-                    <p><strong>Categoría:</strong> {error_context.category.value}</p>
-                    <p><strong>Nivel:</strong> {error_context.level.value}</p>
-                    <p><strong>Timestamp:</strong> {error_context.timestamp}</p>
-                    {f"<p><strong>Modo:</strong> {error_context.process_mode}</p>" if error_context.process_mode else ""}
-                    {f"<p><strong>Mercado:</strong> {error_context.market_id}</p>" if error_context.market_id else ""}
-                </div>
-                
-                <div style="background: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3>🔧 Datos Adicionales</h3>
-                    <pre style="background: #f8f9fa; padding: 10px; border-radius: 4px; overflow-x: auto;">
-                        {error_context.additional_data}
-                    </pre>
-                </div>
-                
-                <div style="background: #f8d7da; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3>📊 Stack Trace</h3>
-                    <pre style="background: #f8f9fa; padding: 10px; border-radius: 4px; overflow-x: auto; font-size: 12px;">
-                        {error_context.stack_trace}
-                    </pre>
-                </div>
-                
-                <div style="margin-top: 30px; padding: 20px; background: #e3f2fd; border-radius: 8px;">
-                    <h3>🔍 Acciones Sugeridas</h3>
-                    {self._get_suggested_actions(error_context)}
-                </div>
-
-                <p style="margin-top: 20px; color: #666;">
-                Powered by Amazon Orders Processor | {datetime.now().isoformat()}
-            </p>
-            </div>
-        </body>
-        </html>
+        Args:
+            suppressed: [repeticiones, primera, última] omitidas desde el aviso anterior
         """
+        return _ERROR_TEMPLATE.substitute(
+            color=(_CRITICAL_COLOR if error_context.level == AlertLevel.CRITICAL
+                   else _WARNING_COLOR),
+            title=title,
+            error_type=error_context.error_type,
+            error_message=error_context.error_message,
+            file_name=error_context.file_name,
+            line_number=error_context.line_number,
+            function_name=error_context.function_name,
+            category=error_context.category.value,
+            level=error_context.level.value,
+            timestamp=error_context.timestamp,
+            mode_block=(_MODE_FRAGMENT.format(error_context.process_mode)
+                        if error_context.process_mode else ""),
+            market_block=(_MARKET_FRAGMENT.format(error_context.market_id)
+                          if error_context.market_id else ""),
+            repeat_block=_REPEAT_FRAGMENT.format(*suppressed) if suppressed else "",
+            additional_data=error_context.additional_data,
+            trace_id=error_context.trace_id or 'n/a',
+            stack_trace=error_context.get_trace_tail(),
+            suggested_actions=self._get_suggested_actions(error_context),
+            generated_at=datetime.now().isoformat()
+        )
 
     def _get_suggested_actions(self, error_context: ErrorContext) -> str:
         """Generar acciones sugeridas según el tipo de error"""
-        actions = {
-            ErrorCategory.API_ERROR: """
-                <ul>
-                    <li>Verificar rate limits de Amazon SP-API</li>
-                    <li>Revisar credenciales de API</li>
-                    <li>Comprobar conectividad</li>
-                </ul>
-            """,
-            ErrorCategory.DATABASE_ERROR: """
-                <ul>
-                    <li>Verificar conexión a base de datos</li>
-                    <li>Revisar espacio en disco</li>
-                    <li>Comprobar permisos de usuario</li>
-                </ul>
-            """,
-            ErrorCategory.PROCESSING_ERROR: """
-                <ul>
-                    <li>Revisar formato de datos</li>
-                    <li>Verificar lógica de negocio</li>
-                    <li>Comprobar transformaciones</li>
-                </ul>
-            """
-        }
-
-        return actions.get(error_context.category, "<p>Revisar logs para más detalles</p>")
+        return _SUGGESTED_ACTIONS.get(error_context.category, _DEFAULT_SUGGESTED_ACTIONS)
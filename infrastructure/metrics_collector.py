@@ -1,44 +1,63 @@
 
-import json
-import aiofiles
+import asyncio
+import time
+import orjson
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Union
 from models.extraction_config import ExtractionConfig
 from models.error_models import ErrorContext
 
 class MetricsCollector:
+    # Métricas por escritura: la tarea de volcado agrupa lo que haya en cola
+    BATCH_SIZE = 256
+    # Métricas pendientes como máximo; con la cola llena se descartan las de
+    # inicio de proceso y el resto espera hueco
+    QUEUE_SIZE = 4096
+    # Buffer del fichero y segundos máximos entre volcados a disco
+    BUFFER_SIZE = 64 * 1024
+    FLUSH_INTERVAL = 1.0
+
     def __init__(self):
         self.metrics_file = "logs/metrics.json"
+        # La tarea de volcado se crea con la primera métrica (el collector
+        # puede construirse fuera del event loop)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._flusher = None
+        self.dropped_metrics = 0
+        # (config, campos fijos ya serializados) del último proceso registrado
+        self._config_fields = (None, b'')
+        # Fichero de métricas abierto en el primer lote y reutilizado;
+        # solo se escribe desde un hilo cada vez (la tarea espera cada escritura)
+        self._fh = None
+        self._last_flush = time.monotonic()
+        # True tras close(): las métricas se escriben directamente
+        self._closed = False
     
     async def record_process_start(self, config: ExtractionConfig):
         """Registrar inicio de proceso"""
         metric = {
             'event': 'process_start',
-            'process_type': config.extract_type.value,
-            'timestamp': datetime.now().isoformat(),
-            'markets': config.markets
+            'timestamp': datetime.now()
         }
-        await self._write_metric(metric)
+        await self._write_metric(self._with_config_fields(metric, config), droppable=True)
 
     async def record_process_complementary_start(self, process_type: str):
         """Registrar inicio de proceso complementario"""
         metric = {
             'event': 'process_start',
             'process_type': process_type,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now()
         }
-        await self._write_metric(metric)
+        await self._write_metric(metric, droppable=True)
     
     async def record_process_success(self, config: ExtractionConfig, order_count: int):
         """Registrar éxito del proceso"""
         metric = {
             'event': 'process_success',
-            'process_type': config.extract_type.value,
-            'timestamp': datetime.now().isoformat(),
-            'order_count': order_count,
-            'markets': config.markets
+            'timestamp': datetime.now(),
+            'order_count': order_count
         }
-        await self._write_metric(metric)
+        await self._write_metric(self._with_config_fields(metric, config))
     
     async def record_process_complementary_success(self, 
                                                    process_type: str, 
@@ -49,7 +68,7 @@ class MetricsCollector:
         metric = {
             'event': 'process_success',
             'process_type': process_type,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.now(),
             'insert_count': insert_count,
             'update_count': update_count,
             'validation_errors_count': validation_errors_count
@@ -59,7 +78,7 @@ class MetricsCollector:
     async def record_process_error(self, error_context: ErrorContext):
         """Registrar error"""
         metric = {
-            'timestamp': error_context.timestamp.isoformat(),
+            'timestamp': error_context.timestamp,
                 'error_type': error_context.error_type,
                 'category': error_context.category.value,
                 'level': error_context.level.value,
@@ -68,7 +87,174 @@ class MetricsCollector:
         }
         await self._write_metric(metric)
     
-    async def _write_metric(self, metric: Dict[str, Any]):
-        """Escribir métrica a archivo"""
-        async with aiofiles.open(self.metrics_file, 'a', encoding='utf-8') as f:
-            await f.write(json.dumps(metric) + '\n')
\ No newline at end of file
+    def _with_config_fields(self, metric: Dict[str, Any], config: ExtractionConfig) -> bytes:
+        """
+        Serializar una métrica de proceso junto a los campos fijos de su config
+
+        process_type y markets no cambian durante un proceso: se serializan
+        una vez por config y se añaden como bytes al final de la línea.
+        """
+        cached_config, fields = self._config_fields
+        if cached_config is not config:
+            fields = orjson.dumps({
+                'process_type': config.extract_type.value,
+                'markets': config.markets
+            })[1:]
+            self._config_fields = (config, fields)
+        return orjson.dumps(metric)[:-1] + b',' + fields + b'\n'
+
+    async def _write_metric(self, metric: Union[Dict[str, Any], bytes], droppable: bool = False):
+        """
+        Encolar métrica: _flush_loop la serializa y escribe por lotes
+
+        Las métricas pueden llegar ya serializadas (una línea en bytes).
+        Con la cola llena, una métrica descartable se pierde (se cuenta en
+        dropped_metrics) en lugar de esperar a que se escriba el disco.
+
+        Tras close() (p.ej. la métrica del error fatal, que los servicios
+        registran fuera de lifecycle) se escribe directamente: una tarea de
+        volcado nueva se cancelaría al terminar el proceso.
+        """
+        if self._closed:
+            await asyncio.to_thread(self._append_direct, metric)
+            return
+
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        try:
+            self._queue.put_nowait(metric)
+        except asyncio.QueueFull:
+            if droppable:
+                self.dropped_metrics += 1
+            else:
+                await self._queue.put(metric)
+
+    async def _flush_loop(self):
+        """
+        Escribir las métricas en cola con un solo write por lote
+
+        Toma todo lo que haya en la cola (hasta BATCH_SIZE métricas) y lo
+        escribe en un hilo. El buffer del fichero se vuelca como mucho cada
+        FLUSH_INTERVAL segundos, o en cuanto la cola queda inactiva ese tiempo.
+        Termina al recibir None; si se cancela (cierre del event loop) escribe
+        antes lo pendiente.
+
+        La espera usa asyncio.wait sobre un get que sobrevive a los timeouts:
+        wait_for puede tragarse la cancelación si el get acaba a la vez, y
+        entonces la tarea no terminaría nunca al cerrar el event loop.
+        """
+        getter = None
+        try:
+            while True:
+                if getter is None:
+                    getter = asyncio.ensure_future(self._queue.get())
+                done, _ = await asyncio.wait((getter,), timeout=self.FLUSH_INTERVAL)
+                if not done:
+                    if self._fh is not None:
+                        await asyncio.to_thread(self._flush_file)
+                    continue
+                metric = getter.result()
+                getter = None
+
+                batch: List[Union[Dict[str, Any], bytes]] = []
+                stop = metric is None
+                if not stop:
+                    batch.append(metric)
+
+                while not stop and len(batch) < self.BATCH_SIZE:
+                    try:
+                        metric = self._queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if metric is None:
+                        stop = True
+                    else:
+                        batch.append(metric)
+
+                if batch:
+                    await asyncio.to_thread(self._write_batch, batch)
+                if stop:
+                    return
+        except asyncio.CancelledError:
+            pending = []
+            if getter is not None:
+                # Un get ya resuelto tiene una métrica que aún no está en la cola
+                if getter.done() and not getter.cancelled():
+                    if getter.result() is not None:
+                        pending.append(getter.result())
+                getter.cancel()
+            while not self._queue.empty():
+                metric = self._queue.get_nowait()
+                if metric is not None:
+                    pending.append(metric)
+            if pending:
+                self._write_batch(pending)
+            self._flush_file()
+            raise
+
+    @staticmethod
+    def _encode(metric: Union[Dict[str, Any], bytes]) -> bytes:
+        """Línea JSON de una métrica (las de proceso llegan ya serializadas)"""
+        if isinstance(metric, bytes):
+            return metric
+        return orjson.dumps(metric, option=orjson.OPT_APPEND_NEWLINE)
+
+    def _write_batch(self, batch: List[Union[Dict[str, Any], bytes]]):
+        """Escribir un lote de métricas en el fichero abierto (se ejecuta en un hilo)"""
+        data = b''.join(map(self._encode, batch))
+        try:
+            self._append(data)
+        except OSError:
+            # Fichero rotado o borrado: reabrir y reintentar una vez
+            self._close_file()
+            try:
+                self._append(data)
+            except OSError as e:
+                # Las métricas no deben detener la tarea de volcado
+                print(f"❌ Error escribiendo métricas ({len(batch)} perdidas): {e}")
+                self._close_file()
+
+    def _append(self, data: bytes):
+        """Añadir líneas ya codificadas al fichero de métricas, abriéndolo la primera vez"""
+        if self._fh is None:
+            self._fh = open(self.metrics_file, 'ab', buffering=self.BUFFER_SIZE)
+        self._fh.write(data)
+        if time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self._flush_file()
+
+    def _append_direct(self, metric: Union[Dict[str, Any], bytes]):
+        """Escribir una métrica abriendo y cerrando el fichero (se ejecuta en un hilo)"""
+        try:
+            with open(self.metrics_file, 'ab') as fh:
+                fh.write(self._encode(metric))
+        except OSError as e:
+            print(f"❌ Error escribiendo métrica: {e}")
+
+    def _flush_file(self):
+        """Volcar a disco el buffer del fichero de métricas"""
+        self._last_flush = time.monotonic()
+        if self._fh is None:
+            return
+        try:
+            self._fh.flush()
+        except OSError as e:
+            print(f"❌ Error volcando métricas: {e}")
+            self._close_file()
+
+    def _close_file(self):
+        """Cerrar el fichero de métricas si está abierto (vuelca su buffer)"""
+        fh, self._fh = self._fh, None
+        if fh is not None:
+            try:
+                fh.close()
+            except OSError:
+                pass
+
+    async def close(self):
+        """Escribir las métricas pendientes, detener la tarea de volcado y cerrar el fichero"""
+        self._closed = True
+        if self._flusher is not None and not self._flusher.done():
+            await self._queue.put(None)
+            await self._flusher
+        self._flusher = None
+        await asyncio.to_thread(self._close_file)
\ No newline at end of file
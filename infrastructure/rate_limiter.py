@@ -2,16 +2,17 @@
 """
 FUNCIONALIDAD:
 - Controla la velocidad de requests a Amazon SP-API
-- Implementa rate limiting con ventanas deslizantes
+- Implementa rate limiting con token bucket por endpoint
 - Maneja diferentes límites por endpoint
 - Backoff automático cuando se alcanzan límites
 """
 
 import asyncio
+import logging
+import random
 import time
-from collections import deque
 from typing import Dict, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
 class APIEndpoint(Enum):
@@ -29,6 +30,26 @@ class RateLimit:
     max_requests: int
     window_seconds: int
     burst_limit: Optional[int] = None
+    # Derivados: tokens por segundo y segundos por token
+    rate: float = field(init=False, repr=False)
+    inv_rate: float = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.rate = self.max_requests / self.window_seconds
+        self.inv_rate = self.window_seconds / self.max_requests
+
+class _EndpointState:
+    """Estado del token bucket de un endpoint"""
+    __slots__ = ('limit', 'tokens', 'last_refill', 'retry_delay', 'backoff', 'last_backoff')
+
+    def __init__(self, limit: RateLimit, tokens: float, last_refill: float):
+        self.limit = limit
+        self.tokens = tokens
+        self.last_refill = last_refill
+        self.retry_delay = 0.0
+        # Tope actual del backoff exponencial ante 429 e instante del último error
+        self.backoff = 0.0
+        self.last_backoff = 0.0
 
 class RateLimiter:
     """Rate limiter inteligente para Amazon SP-API"""
@@ -42,18 +63,23 @@ class RateLimiter:
         APIEndpoint.OFFERS: RateLimit(max_requests=5, window_seconds=60, burst_limit=10),
         APIEndpoint.REPORTS: RateLimit(max_requests=15, window_seconds=60, burst_limit=10),
     }
+    # Backoff ante 429 sin Retry-After: empieza en 2s y se dobla hasta 5 minutos
+    BACKOFF_BASE = 1.0
+    BACKOFF_MAX = 300
     
     def __init__(self, max_requests: int = 100, window: int = 60):
         self.default_limit = RateLimit(max_requests, window)
-        self.request_history: Dict[APIEndpoint, deque] = {}
-        self.locks: Dict[APIEndpoint, asyncio.Lock] = {}
-        self.retry_delays: Dict[APIEndpoint, float] = {}
-        
-        # Inicializar estructuras para cada endpoint
+        self.logger = logging.getLogger("AmazonManagement")
+        # Token bucket por endpoint: límite, tokens disponibles, último
+        # instante (monotonic) de recarga y delay de retry pendiente
+        now = time.monotonic()
+        self._state: Dict[APIEndpoint, _EndpointState] = {}
         for endpoint in APIEndpoint:
-            self.request_history[endpoint] = deque()
-            self.locks[endpoint] = asyncio.Lock()
-            self.retry_delays[endpoint] = 0.0
+            limit = self.ENDPOINT_LIMITS.get(endpoint, self.default_limit)
+            self._state[endpoint] = _EndpointState(limit, float(limit.max_requests), now)
+        # Bucket para el rate limiting genérico (sin endpoint)
+        self._generic_state = _EndpointState(
+            self.default_limit, float(self.default_limit.max_requests), now)
     
     async def __aenter__(self):
         """Context manager para rate limiting genérico"""
@@ -74,75 +100,82 @@ class RateLimiter:
             await self._wait_for_endpoint_limit(endpoint)
     
     async def _wait_for_generic_limit(self):
-        """Rate limiting genérico (usado en context manager)"""
-        # Implementación simple para compatibilidad
-        await asyncio.sleep(0.1)  # Delay mínimo
+        """Rate limiting genérico (usado en context manager) con default_limit"""
+        sleep_time = self._reserve_slot(self._generic_state)
+        if sleep_time > 0:
+            await asyncio.sleep(sleep_time)
     
     async def _wait_for_endpoint_limit(self, endpoint: APIEndpoint):
         """Rate limiting específico por endpoint"""
-        async with self.locks[endpoint]:
-            await self._cleanup_old_requests(endpoint)
-            
-            # Verificar si hay delay de retry pendiente
-            if self.retry_delays[endpoint] > 0:
-                await asyncio.sleep(self.retry_delays[endpoint])
-                self.retry_delays[endpoint] = 0.0
-            
-            limit = self.ENDPOINT_LIMITS.get(endpoint, self.default_limit)
-            request_history = self.request_history[endpoint]
-            
-            # Si hemos alcanzado el límite, esperar
-            if len(request_history) >= limit.max_requests:
-                sleep_time = self._calculate_sleep_time(endpoint)
-                if sleep_time > 0:
-                    print(f"⏱️ Rate limit reached for {endpoint.value}, waiting {sleep_time:.2f}s")
-                    await asyncio.sleep(sleep_time)
-                    await self._cleanup_old_requests(endpoint)
-            
-            # Registrar el request actual
-            request_history.append(time.time())
+        sleep_time = self._reserve_slot(self._state[endpoint])
+        if sleep_time > 0:
+            self.logger.info("⏱️ Rate limit reached for %s, waiting %.2fs",
+                             endpoint.value, sleep_time)
+            await asyncio.sleep(sleep_time)
     
-    async def _cleanup_old_requests(self, endpoint: APIEndpoint):
-        """Limpiar requests antiguos fuera de la ventana"""
-        limit = self.ENDPOINT_LIMITS.get(endpoint, self.default_limit)
-        current_time = time.time()
-        cutoff_time = current_time - limit.window_seconds
+    def _reserve_slot(self, state: _EndpointState) -> float:
+        """
+        Reservar un token del bucket y devolver los segundos a esperar
+
+        Cada request consume un token; los tokens se recargan a ritmo
+        max_requests / window_seconds hasta un máximo de max_requests. Sin
+        tokens el saldo queda negativo: cada request reserva su turno y espera
+        lo que falta para cubrirlo. No hay await, así que en el event loop es
+        atómico y no necesita lock.
+        """
+        limit = state.limit
+        self._refill(state)
         
-        request_history = self.request_history[endpoint]
-        while request_history and request_history[0] < cutoff_time:
-            request_history.popleft()
-    
-    def _calculate_sleep_time(self, endpoint: APIEndpoint) -> float:
-        """Calcular tiempo de espera necesario"""
-        limit = self.ENDPOINT_LIMITS.get(endpoint, self.default_limit)
-        request_history = self.request_history[endpoint]
+        # Delay de retry pendiente: se descuenta como deuda de tokens para
+        # que también esperen los requests que lleguen después
+        if state.retry_delay > 0:
+            state.tokens = min(state.tokens, 1.0) - state.retry_delay * limit.rate
+            state.retry_delay = 0.0
         
-        if not request_history:
+        state.tokens -= 1
+        if state.tokens >= 0:
             return 0.0
-        
-        # Tiempo hasta que el request más antiguo salga de la ventana
-        oldest_request = request_history[0]
-        time_to_wait = limit.window_seconds - (time.time() - oldest_request)
-        
-        return max(0.0, time_to_wait + 0.1)  # +0.1s buffer
+        return -state.tokens * limit.inv_rate
+    
+    @staticmethod
+    def _refill(state: _EndpointState):
+        """Recargar los tokens acumulados desde la última recarga"""
+        now = time.monotonic()
+        state.tokens = min(state.limit.max_requests,
+                           state.tokens + (now - state.last_refill) * state.limit.rate)
+        state.last_refill = now
     
     async def handle_rate_limit_error(self, endpoint: APIEndpoint, retry_after: Optional[int] = None):
         """Manejar error 429 (Too Many Requests)"""
         if retry_after:
             delay = retry_after
         else:
-            # Backoff exponencial si no se especifica retry_after
-            current_delay = self.retry_delays.get(endpoint, 1.0)
-            delay = min(current_delay * 2, 300)  # Max 5 minutos
-            self.retry_delays[endpoint] = delay
+            # Backoff exponencial si no se especifica retry_after. Se guarda el
+            # tope (no el valor con jitter) para que siga creciendo; tras un
+            # periodo sin errores de dos veces el tope vuelve a empezar
+            state = self._state[endpoint]
+            now = time.monotonic()
+            if now - state.last_backoff > state.backoff * 2:
+                state.backoff = 0.0
+            state.backoff = min(max(state.backoff, self.BACKOFF_BASE) * 2,
+                                self.BACKOFF_MAX)
+            state.last_backoff = now
+            # Jitter: los requests que reciben 429 a la vez no reintentan a la vez
+            delay = random.uniform(state.backoff * 0.5, state.backoff)
+            state.retry_delay = delay
         
-        print(f"🚫 Rate limit error for {endpoint.value}, backing off for {delay}s")
+        self.logger.warning("🚫 Rate limit error for %s, backing off for %.2fs",
+                            endpoint.value, delay)
         await asyncio.sleep(delay)
     
     def get_current_usage(self, endpoint: APIEndpoint) -> Dict[str, int]:
         """Obtener uso actual de rate limit"""
-        limit = self.ENDPOINT_LIMITS.get(endpoint, self.default_limit)
-        current_requests = len(self.request_history[endpoint])
+        state = self._state[endpoint]
+        limit = state.limit
+        # Requests "en ventana": tokens consumidos que aún no se han recargado
+        elapsed = time.monotonic() - state.last_refill
+        tokens = min(limit.max_requests, state.tokens + elapsed * limit.rate)
+        current_requests = max(0, round(limit.max_requests - tokens))
         
         return {
             'current_requests': current_requests,
@@ -153,10 +186,12 @@ class RateLimiter:
     
     async def wait_for_quota_reset(self, endpoint: APIEndpoint):
         """Esperar hasta que se resetee completamente la cuota"""
-        limit = self.ENDPOINT_LIMITS.get(endpoint, self.default_limit)
-        await asyncio.sleep(limit.window_seconds + 1)
-        self.request_history[endpoint].clear()
-        self.retry_delays[endpoint] = 0.0
+        state = self._state[endpoint]
+        await asyncio.sleep(state.limit.window_seconds + 1)
+        state.tokens = float(state.limit.max_requests)
+        state.last_refill = time.monotonic()
+        state.retry_delay = 0.0
+        state.backoff = 0.0
 
 # Decorador para rate limiting automático
 def rate_limited(endpoint: APIEndpoint):
@@ -172,17 +207,17 @@ def rate_limited(endpoint: APIEndpoint):
 
 # Rate limiter global para usar como context manager
 class GlobalRateLimiter:
-    """Rate limiter singleton para uso global"""
+    """
+    Rate limiter singleton para uso global
+
+    GlobalRateLimiter() devuelve siempre la misma instancia de RateLimiter:
+    al no ser instancia de esta clase, Python no vuelve a llamar a __init__
+    y su estado se conserva entre llamadas. El context manager es el de
+    RateLimiter.
+    """
     _instance = None
     
-    def __new__(cls):
+    def __new__(cls) -> RateLimiter:
         if cls._instance is None:
             cls._instance = RateLimiter()
-        return cls._instance
-    
-    async def __aenter__(self):
-        await self.acquire()
-        return self
-    
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        pass
\ No newline at end of file
+        return cls._instance
\ No newline at end of file
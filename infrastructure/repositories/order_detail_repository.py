@@ -7,11 +7,15 @@ from typing import List
 from datetime import datetime
 import aiomysql
 import pandas as pd
-import numpy as np
 
 from domain.interfaces.repository_interfaces import IOrderDetailRepository
 
 
+def _is_null_text(value) -> bool:
+    """Texto que representa un nulo (restos de conversiones a str)"""
+    return isinstance(value, str) and (value.lower() == 'nan' or value == 'NaT')
+
+
 class OrderDetailRepository(IOrderDetailRepository):
     """Repositorio especializado en orders detail"""
 
@@ -39,6 +43,37 @@ class OrderDetailRepository(IOrderDetailRepository):
                 results = await cursor.fetchall()
                 return pd.DataFrame(results) if results else pd.DataFrame()
 
+    async def get_existing_change_hashes(self, unique_keys: List[str]) -> pd.DataFrame:
+        """
+        Obtener solo clave y hash de los campos modificables de los registros existentes
+
+        change_hash son los primeros 64 bits del MD5 de los campos
+        isAmazonInvoiced|isBuyerRequestedCancellation|buyerRequestedCancelReason
+        (NULL como cadena vacía), calculado en MySQL para no transferir las filas.
+        Debe coincidir con DataValidator._change_hashes; como NULL y '' dan el
+        mismo texto, un cambio entre ambos no cuenta como modificación.
+        """
+        if not unique_keys:
+            return pd.DataFrame()
+
+        placeholders = ','.join(['%s'] * len(unique_keys))
+        query = f"""
+        SELECT CONCAT(orderId, '|', purchaseDate, '|', orderItemId) as unique_key,
+               CAST(CONV(LEFT(MD5(CONCAT_WS('|',
+                   COALESCE(CAST(isAmazonInvoiced AS CHAR), ''),
+                   COALESCE(CAST(isBuyerRequestedCancellation AS CHAR), ''),
+                   COALESCE(buyerRequestedCancelReason, '')
+               )), 16), 16, 10) AS UNSIGNED) as change_hash
+        FROM ordersdetail 
+        WHERE CONCAT(orderId, '|', purchaseDate, '|', orderItemId) IN ({placeholders})
+        """
+
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, unique_keys)
+                results = await cursor.fetchall()
+                return pd.DataFrame(results) if results else pd.DataFrame()
+
     async def insert_order_details(self, df: pd.DataFrame):
         """Insertar nuevos registros de OrderDetails"""
 
@@ -48,8 +83,9 @@ class OrderDetailRepository(IOrderDetailRepository):
             return
 
         df_clean = df.copy()
-        if 'unique_key' in df_clean.columns:
-            df_clean = df_clean.drop(columns=['unique_key'])
+        # Columnas auxiliares de validación (clave única y su hash)
+        df_clean = df_clean.drop(
+            columns=['unique_key', 'unique_key_h'], errors='ignore')
         df_clean = self._clean_dataframe_for_mysql(df_clean)
 
         # Preparar query de inserción con todas las columnas
@@ -71,6 +107,9 @@ class OrderDetailRepository(IOrderDetailRepository):
         if df.empty:
             return
 
+        # Int8 / category de la validación: pd.NA y NaN deben llegar como None
+        df = self._clean_dataframe_for_mysql(df)
+
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
                 for _, row in df.iterrows():
@@ -190,26 +229,26 @@ class OrderDetailRepository(IOrderDetailRepository):
                 f"Error actualizando referencias Prestashop: {str(e)}")
 
     def _clean_dataframe_for_mysql(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Limpiar dataframe para compatibilidad con MySQL"""
-        df_clean = df.copy()
-
-        # 1. Reemplazar NaN de pandas
-        df_clean = df_clean.fillna(np.nan)
-
-        # 2. Reemplazar string 'nan'
-        df_clean = df_clean.replace(['nan', 'NaN', 'NaT'], None)
-
-        # 3. Convertir timestamps de pandas a datetime de Python
-        for col in df_clean.columns:
-            if df_clean[col].dtype == 'datetime64[ns]':
-                df_clean[col] = df_clean[col].dt.to_pydatetime()
-            elif pd.api.types.is_datetime64_any_dtype(df_clean[col]):
-                df_clean[col] = pd.to_datetime(
-                    df_clean[col]).dt.to_pydatetime()
-
-        # 4. Limpiar valores específicos problemáticos
-        for col in df_clean.columns:
-            df_clean[col] = df_clean[col].apply(
-                lambda x: None if pd.isna(x) or str(x).lower() == 'nan' else x)
+        """
+        Limpiar dataframe para compatibilidad con MySQL
 
-        return df_clean
+        Todas las columnas pasan a object con None en los nulos (NaN, NaT,
+        pd.NA o textos 'nan'/'NaT'). No modifica ningún DataFrame en sitio:
+        cada columna se copia a un array propio, así que es seguro con
+        Copy-on-Write.
+        """
+        columns = {}
+        for col in df.columns:
+            # object también convierte category, Int8 (pd.NA) y datetime (Timestamp)
+            values = df[col].astype(object)
+            is_null = values.isna().to_numpy() | values.map(_is_null_text).to_numpy(dtype=bool)
+
+            # Array object propio; con dtype=object pandas no reinfiere el tipo
+            cleaned = values.to_numpy(copy=True)
+            cleaned[is_null] = None
+            # Timestamps de pandas a datetime de Python
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                cleaned[~is_null] = [ts.to_pydatetime() for ts in cleaned[~is_null]]
+            columns[col] = cleaned
+
+        return pd.DataFrame(columns, index=df.index, columns=df.columns, dtype=object)
@@ -2,7 +2,8 @@
 Repositorio para operaciones de items de órdenes
 """
 import logging
-from typing import List, Dict
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List
 from datetime import datetime, date
 
 from domain.interfaces.repository_interfaces import IOrderItemRepository
@@ -11,25 +12,58 @@ from domain.interfaces.repository_interfaces import IOrderItemRepository
 class OrderItemRepository(IOrderItemRepository):
     """Repositorio especializado en items de órdenes"""
 
+    # Items por sentencia executemany
+    CHUNK_SIZE = 500
+
     def __init__(self, pool):
         self.pool = pool
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    async def upsert_order_items(self, order_items: List[Dict]) -> None:
-        """Insertar o actualizar elementos de órdenes"""
-        if not order_items:
+    async def upsert_order_items(self, order_items: Iterable[Dict], cursor=None) -> None:
+        """
+        Insertar o actualizar elementos de órdenes
+
+        Acepta cualquier iterable y lo escribe en bloques de CHUNK_SIZE, de
+        modo que no es necesario materializar todos los items en una lista.
+
+        Args:
+            order_items: Items a persistir
+            cursor: Cursor de una transacción abierta (opcional); si no se
+                indica se usa una conexión propia del pool
+        """
+        chunks = self._iter_chunks(order_items)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
             return
 
-        self.logger.info(f"Upserting {len(order_items)} items de órdenes")
+        chunks = chain([first_chunk], chunks)
+
+        if cursor is not None:
+            total = await self._upsert_chunks(chunks, cursor)
+        else:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    total = await self._upsert_chunks(chunks, cursor)
 
+        self.logger.info(f"Upsert exitoso de {total} items")
+
+    async def _upsert_chunks(self, chunks: Iterable[List[Dict]], cursor) -> int:
+        """Ejecutar el upsert bloque a bloque y devolver el total de items"""
         query = self._build_upsert_query()
-        data = self._prepare_item_data(order_items)
+        total = 0
+
+        for chunk in chunks:
+            self.logger.info(f"Upserting {len(chunk)} items de órdenes")
+            await cursor.executemany(query, self._prepare_item_data(chunk))
+            total += len(chunk)
 
-        async with self.pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.executemany(query, data)
+        return total
 
-        self.logger.info(f"Upsert exitoso de {len(order_items)} items")
+    def _iter_chunks(self, order_items: Iterable[Dict]) -> Iterator[List[Dict]]:
+        """Partir un iterable de items en listas de CHUNK_SIZE"""
+        iterator = iter(order_items)
+        while chunk := list(islice(iterator, self.CHUNK_SIZE)):
+            yield chunk
 
     def _build_upsert_query(self) -> str:
         """Construir query de upsert para items"""
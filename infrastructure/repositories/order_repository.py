@@ -3,7 +3,7 @@ Repositorio para operaciones de órdenes
 Responsabilidad única: Gestionar persistencia de órdenes
 """
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta, date
 
 import aiomysql
@@ -14,16 +14,43 @@ from domain.interfaces.repository_interfaces import IOrderRepository
 class OrderRepository(IOrderRepository):
     """Repositorio especializado en órdenes"""
 
+    # Columna opcional con el checksum de la orden. Las tablas anteriores no
+    # la tienen: sin ella las consultas devuelven checksum NULL y las
+    # estrategias comparan orderStatus/lastUpdateDate. Para activarla:
+    CHECKSUM_MIGRATION = "ALTER TABLE orders ADD COLUMN checksum BIGINT UNSIGNED NULL"
+
     def __init__(self, pool):
         self.pool = pool
         self.logger = logging.getLogger(self.__class__.__name__)
+        # Se consulta una vez en information_schema (None = sin comprobar)
+        self._has_checksum: Optional[bool] = None
+
+    async def _checksum_enabled(self, cursor) -> bool:
+        """Comprobar (una sola vez) si la tabla orders tiene la columna checksum"""
+        if self._has_checksum is None:
+            await cursor.execute("""
+                SELECT 1 FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'orders' AND COLUMN_NAME = 'checksum'
+                """)
+            self._has_checksum = await cursor.fetchone() is not None
+            if not self._has_checksum:
+                self.logger.warning(
+                    f"La tabla orders no tiene columna checksum; se detectan "
+                    f"cambios por estado y fecha. Migración: {self.CHECKSUM_MIGRATION}")
+        return self._has_checksum
+
+    async def _checksum_select(self, cursor) -> str:
+        """Expresión del SELECT para el checksum (NULL si la columna no existe)"""
+        return "checksum" if await self._checksum_enabled(cursor) else "NULL AS checksum"
 
     async def get_pending_orders(self) -> List[Dict]:
         """Obtener órdenes pendientes de actualización"""
         async with self.pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                query = """
-                SELECT amazonOrderId, orderStatus, lastUpdateDate
+                checksum = await self._checksum_select(cursor)
+                query = f"""
+                SELECT amazonOrderId, orderStatus, lastUpdateDate, {checksum}
                 FROM orders 
                 WHERE orderStatus IN ('Pending', 'Unshipped')
                 LIMIT 1000
@@ -31,19 +58,26 @@ class OrderRepository(IOrderRepository):
                 await cursor.execute(query)
                 return await cursor.fetchall()
 
-    async def upsert_orders(self, orders: List[Dict]) -> None:
-        """Insertar o actualizar órdenes"""
+    async def upsert_orders(self, orders: List[Dict], cursor=None) -> None:
+        """
+        Insertar o actualizar órdenes
+
+        Args:
+            orders: Órdenes a persistir
+            cursor: Cursor de una transacción abierta (opcional); si no se
+                indica se usa una conexión propia del pool
+        """
         if not orders:
             return
 
         self.logger.info(f"Upserting {len(orders)} órdenes")
 
-        query = self._build_upsert_query()
-        data = self._prepare_order_data(orders)
-
-        async with self.pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.executemany(query, data)
+        if cursor is not None:
+            await self._execute_upsert(cursor, orders)
+        else:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await self._execute_upsert(cursor, orders)
 
         self.logger.info(f"Upsert exitoso de {len(orders)} órdenes")
 
@@ -54,10 +88,12 @@ class OrderRepository(IOrderRepository):
 
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
-                query = """
+                with_checksum = await self._checksum_enabled(cursor)
+                query = f"""
                 UPDATE orders 
                 SET orderStatus = %s,
                     lastUpdateDate = %s,
+                    {"checksum = %s," if with_checksum else ""}
                     loadDateTime = %s
                 WHERE amazonOrderId = %s
                 """
@@ -66,6 +102,7 @@ class OrderRepository(IOrderRepository):
                     (
                         order['orderStatus'],
                         order['lastUpdateDate'],
+                        *((order.get('checksum'),) if with_checksum else ()),
                         datetime.now(),
                         order['amazonOrderId']
                     )
@@ -82,8 +119,9 @@ class OrderRepository(IOrderRepository):
 
         async with self.pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                query = """
-                SELECT amazonOrderId, orderStatus, lastUpdateDate
+                checksum = await self._checksum_select(cursor)
+                query = f"""
+                SELECT amazonOrderId, orderStatus, lastUpdateDate, {checksum}
                 FROM orders 
                 WHERE orderStatus IN ('Pending')
                 AND lastUpdateDate < %s
@@ -113,18 +151,25 @@ class OrderRepository(IOrderRepository):
 
         self.logger.info(f"Eliminadas {len(order_ids)} órdenes")
 
-    def _build_upsert_query(self) -> str:
-        """Construir query de upsert"""
-        return """
+    async def _execute_upsert(self, cursor, orders: List[Dict]) -> None:
+        """Ejecutar el upsert con o sin checksum según el esquema de la tabla"""
+        with_checksum = await self._checksum_enabled(cursor)
+        query = self._build_upsert_query(with_checksum)
+        data = self._prepare_order_data(orders, with_checksum)
+        await cursor.executemany(query, data)
+
+    def _build_upsert_query(self, with_checksum: bool = True) -> str:
+        """Construir query de upsert (checksum va al final si la columna existe)"""
+        return f"""
             INSERT INTO orders (
                 purchaseDate, purchaseDateEs, salesChannel, amazonOrderId, buyerEmail,
                 earliestShipDate, latestShipDate, earliestDeliveryDate, latestDeliveryDate,
                 lastUpdateDate, isBusinessOrder, marketplaceId, numberOfItemsShipped, 
                 numberOfItemsUnshipped, orderStatus, totalOrderCurrencyCode, totalOrderAmount,
                 city, countryCode, postalCode, stateOrRegion, expeditionTraking, 
-                isShipFake, loadDate, loadDateTime
+                isShipFake, loadDate, loadDateTime{", checksum" if with_checksum else ""}
             ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s{", %s" if with_checksum else ""}
             ) ON DUPLICATE KEY UPDATE
                 purchaseDate = VALUES(purchaseDate),
                 purchaseDateEs = VALUES(purchaseDateEs),
@@ -145,10 +190,11 @@ class OrderRepository(IOrderRepository):
                 countryCode = VALUES(countryCode),
                 postalCode = VALUES(postalCode),
                 stateOrRegion = VALUES(stateOrRegion),
+                {"checksum = VALUES(checksum)," if with_checksum else ""}
                 loadDateTime = VALUES(loadDateTime)
         """
 
-    def _prepare_order_data(self, orders: List[Dict]) -> List[tuple]:
+    def _prepare_order_data(self, orders: List[Dict], with_checksum: bool = True) -> List[tuple]:
         """Preparar datos para inserción en lote"""
         return [
             (
@@ -176,7 +222,8 @@ class OrderRepository(IOrderRepository):
                 order.get('expeditionTraking'),
                 order.get('isShipFake', 0),
                 order.get('loadDate', date.today()),
-                order.get('loadDateTime', datetime.now())
+                order.get('loadDateTime', datetime.now()),
+                *((order.get('checksum'),) if with_checksum else ())
             )
             for order in orders
         ]
@@ -3,11 +3,23 @@ Chain of Responsibility pattern para validación de datos
 Cada regla es independiente y puede ser reutilizada
 """
 import logging
+import warnings
 import pandas as pd
+from pandas.util import hash_pandas_object
 from abc import ABC, abstractmethod
 from typing import List, Tuple, Optional
 
 
+def hash_column_for(key_column_name: str) -> str:
+    """Nombre de la columna con el hash de una clave única"""
+    return f'{key_column_name}_h'
+
+
+def hash_keys(keys: pd.Series) -> pd.Series:
+    """Hash de 64 bits (uint64) de cada clave, alineado con su índice"""
+    return hash_pandas_object(keys, index=False)
+
+
 class ValidationRule(ABC):
     """Regla de validación base usando Chain of Responsibility"""
 
@@ -82,19 +94,30 @@ class RemoveEmptyRowsRule(ValidationRule):
 class CleanStringFieldsRule(ValidationRule):
     """Regla: Limpiar campos de tipo string"""
 
+    # Textos que representan un valor vacío tras convertir a str
+    # ('<NA>' es como se convierte pd.NA de las columnas de tipo string)
+    NULL_LIKE_VALUES = ['nan', 'NaN', 'None', '<NA>', '']
+
     async def _validate_impl(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
-        df_clean = df.copy()
+        df_clean = df.copy(deep=False)
 
         # Identificar columnas string
-        string_columns = df_clean.select_dtypes(include=['object']).columns
+        # Incluye 'string' (python o pyarrow) además de object
+        string_columns = df_clean.select_dtypes(include=['object', 'string']).columns
 
-        for col in string_columns:
-            if col in df_clean.columns:
-                # Strip whitespace
-                df_clean[col] = df_clean[col].astype(str).str.strip()
-                # Reemplazar valores tipo "nan"
-                df_clean[col] = df_clean[col].replace(
-                    ['nan', 'NaN', 'None', ''], None)
+        if len(string_columns):
+            # Strip y detección de vacíos en una sola pasada por valor
+            # (sin convertir antes toda la columna a str ni un isin aparte)
+            null_like = frozenset(self.NULL_LIKE_VALUES)
+
+            def clean_value(value):
+                if value is None or value is pd.NA:
+                    return None
+                text = value.strip() if isinstance(value, str) else str(value).strip()
+                return None if text in null_like else text
+
+            df_clean[string_columns] = df_clean[string_columns].apply(
+                lambda col: col.map(clean_value).astype(object))
 
         return df_clean, []
 
@@ -137,7 +160,7 @@ class NormalizeDateFieldsRule(ValidationRule):
         self.date_columns = date_columns
 
     async def _validate_impl(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
-        df_clean = df.copy()
+        df_clean = df.copy(deep=False)
         errors = []
 
         for col in self.date_columns:
@@ -145,41 +168,39 @@ class NormalizeDateFieldsRule(ValidationRule):
                 continue
 
             try:
-                # Identificar valores vacíos
-                original_col = df_clean[col].copy()
-                mask_empty = (
-                    original_col.isnull() |
-                    (original_col == '') |
-                    (original_col.astype(str).str.strip() == '')
-                )
-                mask_valid = ~mask_empty
-
-                if mask_valid.sum() == 0:
+                # Trabajar sobre los valores distintos: en un reporte muchas
+                # líneas comparten fecha, así que la detección de vacíos y el
+                # parseo se hacen una vez por valor y se reparten por posición
+                original_col = df_clean[col]
+                uniques = pd.Index(original_col.unique())
+                positions = uniques.get_indexer(original_col)
+                unique_values = pd.Series(uniques, dtype=object)
+
+                unique_empty = (
+                    unique_values.isnull() |
+                    (unique_values.astype(str).str.strip() == '')
+                ).to_numpy()
+                mask_valid = ~unique_empty[positions]
+
+                if not mask_valid.any():
                     continue
 
-                # Inicializar columna con NaT
-                df_clean[col] = pd.NaT
-                valid_values = original_col[mask_valid]
-
-                # Intentar conversión
-                converted_dates = pd.to_datetime(valid_values, errors='coerce')
+                # Intentar conversión (formatos mezclados en una sola pasada);
+                # los vacíos se pasan como nulos y quedan como NaT
+                parsed_uniques = self._parse_dates(unique_values.where(~unique_empty))
 
                 # Remover timezone si existe
-                if converted_dates.dt.tz is not None:
-                    converted_dates = converted_dates.dt.tz_localize(None)
-
-                # Asignar valores convertidos
-                df_clean.loc[mask_valid, col] = converted_dates
+                if parsed_uniques.dt.tz is not None:
+                    parsed_uniques = parsed_uniques.dt.tz_localize(None)
 
-                # Convertir a string para MySQL
-                mask_converted = df_clean[col].notna()
-                if mask_converted.any():
-                    df_clean.loc[mask_converted, col] = df_clean.loc[
-                        mask_converted, col
-                    ].dt.strftime('%Y-%m-%d %H:%M:%S')
+                # Asignar valores convertidos (se mantienen como datetime64;
+                # el formato de texto se aplica solo al generar claves)
+                converted_dates = parsed_uniques.iloc[positions].set_axis(
+                    original_col.index)
+                df_clean[col] = converted_dates
 
                 # Contar errores de conversión
-                failed_count = converted_dates.isnull().sum()
+                failed_count = (converted_dates.isnull().to_numpy() & mask_valid).sum()
                 if failed_count > 0:
                     errors.append(
                         f"Columna {col}: {failed_count} fechas no pudieron ser convertidas"
@@ -191,28 +212,62 @@ class NormalizeDateFieldsRule(ValidationRule):
 
         return df_clean, errors
 
+    def _parse_dates(self, values: pd.Series) -> pd.Series:
+        """
+        Parsear fechas con formatos mezclados en una sola llamada
+
+        format='mixed' interpreta cada valor por separado (ISO, "%m/%d/%Y
+        %H:%M:%S", ...). Si la columna mezcla zonas horarias, se normaliza a UTC.
+        """
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', FutureWarning)
+                parsed = pd.to_datetime(values, errors='coerce', format='mixed')
+            if parsed.dtype != object:
+                return parsed
+        except ValueError:
+            pass
+
+        return pd.to_datetime(values, errors='coerce', format='mixed', utc=True)
+
 
 class GenerateUniqueKeysRule(ValidationRule):
     """Regla: Generar claves únicas para deduplicación"""
 
+    # Formato de las fechas dentro de la clave
+    DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
     def __init__(self, key_fields: List[str], key_column_name: str = 'unique_key'):
         super().__init__()
         self.key_fields = key_fields
         self.key_column_name = key_column_name
+        self.hash_column_name = hash_column_for(key_column_name)
 
     async def _validate_impl(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
-        df_clean = df.copy()
+        df_clean = df.copy(deep=False)
 
-        # Generar clave única concatenando campos
+        # Generar clave única concatenando campos en una sola pasada
+        first, *others = [self._key_part(df_clean[field]) for field in self.key_fields]
         df_clean[self.key_column_name] = (
-            df_clean[self.key_fields[0]].astype(str)
+            first.str.cat(others, sep='|') if others else first
         )
 
-        for field in self.key_fields[1:]:
-            df_clean[self.key_column_name] += '|' + df_clean[field].astype(str)
+        # Hash de 64 bits de la clave para duplicated/isin sobre enteros
+        df_clean[self.hash_column_name] = hash_keys(df_clean[self.key_column_name])
 
         return df_clean, []
 
+    def _key_part(self, values: pd.Series) -> pd.Series:
+        """
+        Texto de un campo para la clave
+
+        Las fechas se formatean siempre como "%Y-%m-%d %H:%M:%S" (igual que
+        CONCAT en MySQL); astype(str) omite la hora si todas son medianoche.
+        """
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values.dt.strftime(self.DATETIME_FORMAT).fillna('NaT')
+        return values.astype(str)
+
 
 class RemoveInternalDuplicatesRule(ValidationRule):
     """Regla: Remover duplicados dentro del mismo DataFrame"""
@@ -225,9 +280,18 @@ class RemoveInternalDuplicatesRule(ValidationRule):
     async def _validate_impl(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
         initial_count = len(df)
 
-        # Detectar duplicados
-        duplicate_mask = df.duplicated(
-            subset=[self.unique_key_column], keep=self.keep)
+        # Detectar duplicados sobre el hash entero si existe; la clave de texto
+        # solo se compara en las filas cuyo hash se repite (descarta colisiones)
+        hash_column = hash_column_for(self.unique_key_column)
+        if hash_column in df.columns:
+            duplicate_mask = df[hash_column].duplicated(keep=False).to_numpy(copy=True)
+            if duplicate_mask.any():
+                candidates = df[self.unique_key_column][duplicate_mask]
+                duplicate_mask[duplicate_mask] = candidates.duplicated(
+                    keep=self.keep).to_numpy()
+        else:
+            duplicate_mask = df.duplicated(
+                subset=[self.unique_key_column], keep=self.keep)
         duplicate_count = duplicate_mask.sum()
 
         errors = []
@@ -251,16 +315,49 @@ class ConvertNumericFieldsRule(ValidationRule):
         self.numeric_columns = numeric_columns
 
     async def _validate_impl(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
-        df_clean = df.copy()
+        df_clean = df.copy(deep=False)
         errors = []
 
-        for col in self.numeric_columns:
-            if col not in df_clean.columns:
-                continue
+        present_columns = [
+            col for col in self.numeric_columns if col in df_clean.columns]
 
+        if present_columns:
             try:
-                df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
+                df_clean[present_columns] = df_clean[present_columns].apply(
+                    pd.to_numeric, errors='coerce')
             except Exception as e:
-                errors.append(f"Error convirtiendo {col} a numérico: {str(e)}")
+                errors.append(
+                    f"Error convirtiendo {present_columns} a numérico: {str(e)}")
+
+        return df_clean, errors
+
+
+class CompactLowCardinalityFieldsRule(ValidationRule):
+    """Regla: Compactar campos de baja cardinalidad (flags y motivos)"""
+
+    # Tipo para flags 0/1 que admite nulos
+    FLAG_DTYPE = 'Int8'
+
+    def __init__(self, flag_columns: List[str], category_columns: List[str]):
+        super().__init__()
+        self.flag_columns = flag_columns
+        self.category_columns = category_columns
+
+    async def _validate_impl(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+        df_clean = df.copy(deep=False)
+        errors = []
+
+        for col in self.flag_columns:
+            if col not in df_clean.columns:
+                continue
+            try:
+                df_clean[col] = df_clean[col].astype(self.FLAG_DTYPE)
+            except (TypeError, ValueError):
+                # Valores no enteros: se mantiene el tipo numérico original
+                pass
+
+        for col in self.category_columns:
+            if col in df_clean.columns:
+                df_clean[col] = df_clean[col].astype('category')
 
         return df_clean, errors
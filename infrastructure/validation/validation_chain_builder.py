@@ -11,7 +11,8 @@ from infrastructure.validation.validation_chain import (
     NormalizeDateFieldsRule,
     GenerateUniqueKeysRule,
     RemoveInternalDuplicatesRule,
-    ConvertNumericFieldsRule
+    ConvertNumericFieldsRule,
+    CompactLowCardinalityFieldsRule
 )
 
 
@@ -104,6 +105,22 @@ class ValidationChainBuilder:
         self.rules.append(ConvertNumericFieldsRule(numeric_columns))
         return self
 
+    def compact_low_cardinality(
+        self,
+        flag_columns: List[str],
+        category_columns: List[str]
+    ) -> 'ValidationChainBuilder':
+        """
+        Agregar regla para compactar campos de baja cardinalidad
+
+        Args:
+            flag_columns: Columnas 0/1 a convertir a Int8
+            category_columns: Columnas de texto a convertir a category
+        """
+        self.rules.append(CompactLowCardinalityFieldsRule(
+            flag_columns, category_columns))
+        return self
+
     def add_custom_rule(self, rule: ValidationRule) -> 'ValidationChainBuilder':
         """
         Agregar regla personalizada
@@ -92,7 +92,7 @@ def getOrder(orderId: str, tagSubjectMail: str = ''):
         str_time = order.get("PurchaseDate")
         str_time = str_time.replace('T', ' ').replace('Z', '')
         order_data['purchaseDateEs'].append(
-            datetime.strptime(str_time, '%Y-%m-%d %H:%M:%S') +
+            datetime.strptime(str_time[:19], '%Y-%m-%d %H:%M:%S') +
             timedelta(hours=st.difHoursUtc) if purchas_date else None
         )
 
@@ -254,7 +254,7 @@ def getOrders(dateInit: str, dateEnd: str, market: list, context: dict = None) -
                 str_time = str_time.replace('T', ' ').replace('Z', '')
                 if str_time:
                     local_date = datetime.strptime(
-                        str_time, '%Y-%m-%d %H:%M:%S') + timedelta(hours=st.difHoursUtc)
+                        str_time[:19], '%Y-%m-%d %H:%M:%S') + timedelta(hours=st.difHoursUtc)
                     purchaseDateEs.append(local_date)
                 else:
                     purchaseDateEs.append(None)
@@ -10,10 +10,14 @@ import asyncio
 import logging
 import sys
 import argparse
+import pandas as pd
 from infrastructure.dependency_injection.container import DependencyContainer
 from utils.unified_order_processor import UnifiedOrderProcessor, ProcessMode
 from infrastructure.error_handling import EnhancedErrorHandler
 
+# Copy-on-Write: las copias y vistas de DataFrame solo se materializan al escribir
+pd.options.mode.copy_on_write = True
+
 
 async def main():
     EnhancedErrorHandler()
@@ -1,8 +1,8 @@
 
+import traceback
 from enum import Enum
-from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 class AlertLevel(Enum):
     INFO = "info"
@@ -16,18 +16,50 @@ class ErrorCategory(Enum):
     PROCESSING_ERROR = "processing_error"
     SYSTEM_ERROR = "system_error"
 
-@dataclass
 class ErrorContext:
     """Contexto enriquecido del error"""
-    error_type: str
-    error_message: str
-    file_name: str
-    line_number: int
-    function_name: str
-    category: ErrorCategory
-    level: AlertLevel
-    timestamp: datetime
-    additional_data: Dict[str, Any] = None
-    stack_trace: str = None
-    process_mode: str = None
-    market_id: str = None
\ No newline at end of file
+    # Se crea uno por error: sin __dict__ por instancia
+    __slots__ = ('error_type', 'error_message', 'file_name', 'line_number',
+                 'function_name', 'category', 'level', 'timestamp',
+                 'additional_data', 'stack_trace', 'process_mode', 'market_id',
+                 'exception', 'trace_id')
+
+    def __init__(self, error_type: str, error_message: str, file_name: str,
+                 line_number: int, function_name: str, category: ErrorCategory,
+                 level: AlertLevel, timestamp: datetime,
+                 additional_data: Dict[str, Any] = None, stack_trace: str = None,
+                 process_mode: str = None, market_id: str = None,
+                 exception: Optional[BaseException] = None, trace_id: str = None):
+        self.error_type = error_type
+        self.error_message = error_message
+        self.file_name = file_name
+        self.line_number = line_number
+        self.function_name = function_name
+        self.category = category
+        self.level = level
+        self.timestamp = timestamp
+        self.additional_data = additional_data
+        self.stack_trace = stack_trace
+        self.process_mode = process_mode
+        self.market_id = market_id
+        # Excepción original: el stack trace se formatea solo si alguien lo lee
+        self.exception = exception
+        # Identificador con el que se registra la traza completa en el log
+        self.trace_id = trace_id
+
+    def get_stack_trace(self) -> str:
+        """Stack trace formateado bajo demanda (se guarda en stack_trace)"""
+        if self.stack_trace is None and self.exception is not None:
+            self.stack_trace = ''.join(traceback.format_exception(
+                type(self.exception), self.exception, self.exception.__traceback__))
+        return self.stack_trace
+
+    def get_trace_tail(self, frames: int = 3) -> str:
+        """Últimos frames del stack trace y la línea de la excepción"""
+        if self.exception is None:
+            # Cada frame ocupa dos líneas ("File ..." y el código)
+            return '\n'.join((self.stack_trace or '').splitlines()[-(2 * frames + 1):])
+        tb = traceback.extract_tb(self.exception.__traceback__)[-frames:]
+        return ''.join(traceback.format_list(tb) +
+                       traceback.format_exception_only(
+                           type(self.exception), self.exception))
\ No newline at end of file
@@ -13,6 +13,9 @@ class ExtractType(Enum):
     ORDER_DETAILS = "order_details"
     SHIPMENT_UPDATE = "shipment_update"
 
+# Estados de Amazon que ya no cambian: sus items pueden cachearse sin caducidad
+TERMINAL_ORDER_STATUSES = frozenset({'Shipped', 'Canceled', 'Unfulfillable'})
+
 @dataclass
 class ExtractionConfig:
     extract_type: ExtractType
@@ -22,6 +25,8 @@ class ExtractionConfig:
     file_path: Optional[str] = None
     batch_size: int = 100
     description: Optional[str] = None
+    items_cache_ttl_seconds: int = 300
+    items_concurrency: int = 10
 
     def __post_init__(self):
         """Validaciones post-inicialización"""
@@ -30,6 +35,12 @@ class ExtractionConfig:
         
         if self.batch_size <= 0:
             raise ValueError(f"batch_size must be positive, got {self.batch_size}")
+
+        if self.items_concurrency <= 0:
+            raise ValueError(f"items_concurrency must be positive, got {self.items_concurrency}")
+
+        if self.items_cache_ttl_seconds < 0:
+            raise ValueError(f"items_cache_ttl_seconds cannot be negative, got {self.items_cache_ttl_seconds}")
         
         if not self.markets:
             raise ValueError("markets list cannot be empty")
\ No newline at end of file
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+from core.amazon_api_client import AmazonAPIClient
+from infrastructure.rate_limiter import APIEndpoint, RateLimiter
+
+
+def _client(pages) -> AmazonAPIClient:
+    """Cliente sin credenciales: get_orders_page devuelve/lanza pages en orden"""
+    client = AmazonAPIClient.__new__(AmazonAPIClient)
+    client.session = None
+    client.rate_limiter = MagicMock(spec=RateLimiter)
+    client.rate_limiter.acquire = AsyncMock()
+    client.rate_limiter.handle_rate_limit_error = AsyncMock()
+    client.api_wrapper = MagicMock()
+    client.api_wrapper.get_orders_page.side_effect = pages
+    return client
+
+
+async def _collect(client: AmazonAPIClient, markets):
+    return [page async for page in client.iter_orders_paginated(
+        datetime(2024, 1, 1), datetime(2024, 1, 2), markets)]
+
+
+class IterOrdersPaginatedTest(unittest.TestCase):
+
+    @patch('core.amazon_api_client.asyncio.sleep', new_callable=AsyncMock)
+    def test_follows_next_token_per_market(self, sleep):
+        client = _client([
+            ({'orders': [{'id': 1}], 'next_token': 'T1'}, True),
+            ({'orders': [{'id': 2}], 'next_token': None}, True),
+            ({'orders': [], 'next_token': None}, True),
+        ])
+
+        pages = asyncio.run(_collect(client, ['M1', 'M2']))
+
+        self.assertEqual(pages, [[{'id': 1}], [{'id': 2}]])
+        tokens = [c.kwargs['next_token'] for c in client.api_wrapper.get_orders_page.call_args_list]
+        self.assertEqual(tokens, [None, 'T1', None])
+        self.assertEqual(client.rate_limiter.acquire.await_args_list,
+                         [call(APIEndpoint.ORDERS), call(APIEndpoint.ORDERS)])
+
+    @patch('core.amazon_api_client.asyncio.sleep', new_callable=AsyncMock)
+    def test_rate_limited_page_is_retried(self, sleep):
+        client = _client([
+            ({'orders': [{'id': 1}], 'next_token': 'T1'}, True),
+            ({'code': 429}, False),
+            ({'orders': [{'id': 2}], 'next_token': None}, True),
+        ])
+
+        pages = asyncio.run(_collect(client, ['M1']))
+
+        self.assertEqual(pages, [[{'id': 1}], [{'id': 2}]])
+        client.rate_limiter.handle_rate_limit_error.assert_awaited_once_with(APIEndpoint.ORDERS)
+        # El reintento repite solo la página fallida
+        tokens = [c.kwargs['next_token'] for c in client.api_wrapper.get_orders_page.call_args_list]
+        self.assertEqual(tokens, [None, 'T1', 'T1'])
+
+    @patch('core.amazon_api_client.asyncio.sleep', new_callable=AsyncMock)
+    def test_gives_up_after_max_retries(self, sleep):
+        client = _client([({}, False)] * 3)
+
+        with self.assertRaises(Exception):
+            asyncio.run(_collect(client, ['M1']))
+
+        self.assertEqual(client.api_wrapper.get_orders_page.call_count, 3)
+        client.rate_limiter.handle_rate_limit_error.assert_not_awaited()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import logging
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pandas as pd
+
+from infrastructure.data_validator import DataValidator, _field_text
+
+
+def _mysql_change_hash(is_amazon_invoiced, is_cancellation, reason) -> int:
+    """
+    Réplica paso a paso de la expresión de get_existing_change_hashes
+
+    CAST(CONV(LEFT(MD5(CONCAT_WS('|', COALESCE(CAST(flag AS CHAR), ''), ...,
+    COALESCE(reason, ''))), 16), 16, 10) AS UNSIGNED) sobre los valores tal
+    como se guardan en MySQL (TINYINT o NULL, VARCHAR utf8mb4 o NULL).
+    """
+    def cast_char(value):
+        return None if value is None else str(value)
+
+    def coalesce(value):
+        return '' if value is None else value
+
+    text = '|'.join((
+        coalesce(cast_char(is_amazon_invoiced)),
+        coalesce(cast_char(is_cancellation)),
+        coalesce(reason),
+    ))
+    md5_hex = hashlib.md5(text.encode('utf-8')).hexdigest()
+    return int(md5_hex[:16], 16)
+
+
+# Texto que concatena MySQL y su MD5 (SELECT MD5(CONCAT_WS(...)))
+_MYSQL_MD5 = {
+    (None, None, None): ('||', '7d010443693eec253a121e2aa2ba177c'),
+    (1, 0, None): ('1|0|', '1e2051b7ffdbe6e9ce419a0790686cd9'),
+    (0, 1, 'Envío tardío'): ('0|1|Envío tardío', 'da8e5362a4ccd8635b6f5f9514f5e581'),
+}
+
+
+class ChangeHashParityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.validator = DataValidator.__new__(DataValidator)
+
+    def _assert_matches_mysql(self, df: pd.DataFrame, db_rows):
+        expected = np.array([_mysql_change_hash(*row) for row in db_rows], dtype=np.uint64)
+        np.testing.assert_array_equal(self.validator._change_hashes(df), expected)
+
+    def test_mysql_reference_values(self):
+        for row, (text, md5_hex) in _MYSQL_MD5.items():
+            with self.subTest(text=text):
+                self.assertEqual(hashlib.md5(text.encode('utf-8')).hexdigest(), md5_hex)
+                self.assertEqual(_mysql_change_hash(*row), int(md5_hex[:16], 16))
+
+    def test_numeric_flags_as_float(self):
+        # pd.to_numeric deja los flags como float64 (1.0, NaN)
+        df = pd.DataFrame({
+            'isAmazonInvoiced': [np.nan, 1.0, 0.0],
+            'isBuyerRequestedCancellation': [np.nan, 0.0, 1.0],
+            'buyerRequestedCancelReason': [None, np.nan, 'Envío tardío'],
+        })
+
+        self._assert_matches_mysql(df, [(None, None, None), (1, 0, None), (0, 1, 'Envío tardío')])
+
+    def test_compacted_flags_and_category(self):
+        # Tras compact_low_cardinality: Int8 con pd.NA y category
+        df = pd.DataFrame({
+            'isAmazonInvoiced': pd.array([pd.NA, 1, 0], dtype='Int8'),
+            'isBuyerRequestedCancellation': pd.array([pd.NA, 0, 1], dtype='Int8'),
+            'buyerRequestedCancelReason': pd.Categorical([None, None, 'Envío tardío']),
+        })
+
+        self._assert_matches_mysql(df, [(None, None, None), (1, 0, None), (0, 1, 'Envío tardío')])
+
+    def test_bool_flags(self):
+        df = pd.DataFrame({
+            'isAmazonInvoiced': [True, False],
+            'isBuyerRequestedCancellation': [False, True],
+            'buyerRequestedCancelReason': [None, 'Envío tardío'],
+        })
+
+        self._assert_matches_mysql(df, [(1, 0, None), (0, 1, 'Envío tardío')])
+
+    def test_null_and_empty_string_are_equal(self):
+        self.assertEqual(_field_text(None), _field_text(''))
+        self.assertEqual(_mysql_change_hash(1, 0, None), _mysql_change_hash(1, 0, ''))
+
+        df = pd.DataFrame({
+            'isAmazonInvoiced': [1.0, 1.0],
+            'isBuyerRequestedCancellation': [0.0, 0.0],
+            'buyerRequestedCancelReason': [None, ''],
+        })
+        hashes = self.validator._change_hashes(df)
+        self.assertEqual(hashes[0], hashes[1])
+
+
+class CompareWithDatabaseTest(unittest.TestCase):
+
+    def test_unchanged_rows_with_hashes_on_both_sides_of_2_63(self):
+        validator = DataValidator.__new__(DataValidator)
+        validator.logger = logging.getLogger('DataValidator')
+        validator.EXISTING_KEYS_CHUNK_SIZE = 2
+
+        # Motivos cuyo hash queda por debajo y por encima de 2**63
+        reasons = [f'motivo {i}' for i in range(50)]
+        hashes = {r: _mysql_change_hash(1, 0, r) for r in reasons}
+        low = [r for r in reasons if hashes[r] < 2 ** 63][:2]
+        high = [r for r in reasons if hashes[r] >= 2 ** 63][:2]
+        ordered = low + high
+
+        df = pd.DataFrame({
+            'unique_key': [f'key-{i}' for i in range(4)],
+            'isAmazonInvoiced': [1.0] * 4,
+            'isBuyerRequestedCancellation': [0.0] * 4,
+            'buyerRequestedCancelReason': ordered,
+        })
+
+        def existing(keys):
+            # Como DictCursor + DataFrame: cada sub-lote infiere su propio dtype
+            rows = [{'unique_key': k, 'change_hash': hashes[ordered[int(k[-1])]]} for k in keys]
+            return pd.DataFrame(rows)
+
+        validator.db_manager = MagicMock()
+        validator.db_manager.order_details.get_existing_change_hashes = AsyncMock(
+            side_effect=existing)
+
+        to_insert, to_update = asyncio.run(validator._compare_with_database(df))
+
+        self.assertTrue(to_insert.empty)
+        self.assertTrue(to_update.empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from infrastructure.error_handling import EnhancedErrorHandler, _stop_log_listener
+
+
+class HandleErrorCsvLogTest(unittest.TestCase):
+
+    def setUp(self):
+        # El handler escribe en logs/ relativo al directorio actual
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+
+    def tearDown(self):
+        _stop_log_listener()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_error_reaches_csv_event_log(self):
+        async def run():
+            handler = EnhancedErrorHandler()
+            handler._send_error_notification = AsyncMock()
+            try:
+                raise ValueError('Pedido; "inválido"')
+            except ValueError as e:
+                await handler.handle_error(e, {'process_mode': 'incremental'})
+            await handler._close_event_log()
+            await handler.metrics.close()
+
+        asyncio.run(run())
+
+        with open(os.path.join('logs', EnhancedErrorHandler.CSV_LOG_FILE), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('event_date;event_class;event_desc'))
+        self.assertIn(';ValueError;"Pedido; ""inválido""";', lines[1])
+        self.assertIn(';incremental;', lines[1])
+
+    def test_csv_event_log_does_not_depend_on_log_level(self):
+        async def run():
+            handler = EnhancedErrorHandler()
+            handler._send_error_notification = AsyncMock()
+            # Subir el nivel del log de consola/ficheros no detiene la auditoría CSV
+            handler.logger.setLevel(logging.CRITICAL + 1)
+            try:
+                raise ValueError('fallo')
+            except ValueError as e:
+                await handler.handle_error(e)
+            await handler._close_event_log()
+            await handler.metrics.close()
+
+        asyncio.run(run())
+
+        with open(os.path.join('logs', EnhancedErrorHandler.CSV_LOG_FILE), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertIn(';ValueError;fallo;', lines[1])
+
+
+class HandleErrorAfterCloseTest(unittest.TestCase):
+    """Los servicios gestionan el error fatal después de cerrar lifecycle"""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+
+    def tearDown(self):
+        _stop_log_listener()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_error_email_is_sent_after_close(self):
+        handler = EnhancedErrorHandler()
+        handler._email_initialized = True
+        handler.email_client = MagicMock()
+        handler.email_client.send_email = AsyncMock()
+        handler.email_client.close = AsyncMock()
+
+        async def run():
+            await handler._close_email_client()
+            try:
+                raise ValueError('fallo fatal')
+            except ValueError as e:
+                await handler.handle_error(e, {'process_mode': 'incremental'})
+            # Enviado antes de volver: no depende de una tarea pendiente
+            handler.email_client.send_email.assert_awaited_once()
+            await handler.metrics.close()
+
+        asyncio.run(run())
+
+    def test_csv_row_is_written_after_close(self):
+        handler = EnhancedErrorHandler()
+        handler._send_error_notification = AsyncMock()
+        csv_path = os.path.join('logs', EnhancedErrorHandler.CSV_LOG_FILE)
+
+        async def run():
+            await handler._close_event_log()
+            try:
+                raise ValueError('fallo fatal')
+            except ValueError as e:
+                await handler.handle_error(e)
+            # Escrita antes de volver: no depende de una tarea pendiente
+            with open(csv_path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            await handler.metrics.close()
+            return lines
+
+        lines = asyncio.run(run())
+
+        self.assertEqual(len(lines), 2)
+        self.assertIn(';ValueError;fallo fatal;', lines[1])
+
+
+class StackTraceLoggingTest(unittest.TestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+
+    def tearDown(self):
+        _stop_log_listener()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_emailed_error_logs_full_trace_once(self):
+        handler = EnhancedErrorHandler()
+        handler._email_initialized = True
+        handler.email_client = MagicMock()
+        handler.email_client.send_email = AsyncMock()
+        handler.email_client.close = AsyncMock()
+
+        async def run():
+            try:
+                raise ValueError('fallo')
+            except ValueError as e:
+                await handler.handle_error(e)
+            await handler._close_email_client()
+            await handler._close_event_log()
+            await handler.metrics.close()
+
+        with self.assertLogs('AmazonManagement', 'DEBUG') as logs:
+            asyncio.run(run())
+
+        traces = [r for r in logs.records if r.getMessage().startswith('Stack trace [')]
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(traces[0].levelname, 'ERROR')
+        handler.email_client.send_email.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
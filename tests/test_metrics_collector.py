@@ -0,0 +1,57 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import orjson
+
+from infrastructure.metrics_collector import MetricsCollector
+
+
+class MetricsCollectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.metrics_file = os.path.join(self._tmp.name, 'metrics.json')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _collector(self) -> MetricsCollector:
+        collector = MetricsCollector()
+        collector.metrics_file = self.metrics_file
+        return collector
+
+    def _events(self):
+        with open(self.metrics_file, 'rb') as f:
+            return [orjson.loads(line)['event'] for line in f]
+
+    def test_metric_after_close_is_written(self):
+        collector = self._collector()
+
+        async def run():
+            await collector.record_process_complementary_start('order_details')
+            await collector.close()
+            # Como la métrica del error fatal: llega con el collector cerrado
+            await collector.record_process_complementary_success('order_details', 1, 0, 0)
+            # Escrita antes de volver y sin arrancar otra tarea de volcado
+            self.assertEqual(self._events(), ['process_start', 'process_success'])
+            self.assertIsNone(collector._flusher)
+
+        asyncio.run(run())
+
+    def test_pending_metrics_written_when_loop_closes(self):
+        collector = self._collector()
+
+        async def run():
+            for _ in range(3):
+                await collector.record_process_complementary_start('order_details')
+
+        # Sin close(): asyncio.run cancela la tarea de volcado al terminar
+        asyncio.run(run())
+
+        self.assertEqual(self._events(), ['process_start'] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import datetime
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from infrastructure.repositories.order_detail_repository import OrderDetailRepository
+
+
+class CleanDataframeForMysqlTest(unittest.TestCase):
+    """_clean_dataframe_for_mysql con Copy-on-Write activo (como en main.py)"""
+
+    def setUp(self):
+        self.repo = OrderDetailRepository(pool=None, prestashop_pool=None)
+
+    def _frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'orderId': ['A-1', None, 'nan', 'NaT'],
+            'amount': [1.5, np.nan, 3.0, 0.0],
+            'purchaseDate': pd.to_datetime(['2024-01-01', None, '2024-01-02', '2024-02-02']),
+            'buyerRequestedCancelReason': pd.Categorical(['Otro', None, 'Otro', 'Envío tardío']),
+            'isAmazonInvoiced': pd.array([1, None, 0, 1], dtype='Int8'),
+        })
+
+    def test_clean_with_copy_on_write(self):
+        df = self._frame()
+        with pd.option_context('mode.copy_on_write', True):
+            cleaned = self.repo._clean_dataframe_for_mysql(df)
+
+        rows = [tuple(row) for row in cleaned.values]
+        self.assertEqual(rows, [
+            ('A-1', 1.5, datetime.datetime(2024, 1, 1), 'Otro', 1),
+            (None, None, None, None, None),
+            (None, 3.0, datetime.datetime(2024, 1, 2), 'Otro', 0),
+            (None, 0.0, datetime.datetime(2024, 2, 2), 'Envío tardío', 1),
+        ])
+        self.assertIs(type(rows[0][2]), datetime.datetime)
+
+    def test_input_frame_is_not_modified(self):
+        df = self._frame()
+        expected = df.copy()
+        with pd.option_context('mode.copy_on_write', True):
+            self.repo._clean_dataframe_for_mysql(df)
+        pd.testing.assert_frame_equal(df, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import re
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from infrastructure.repositories.order_repository import OrderRepository
+
+
+def _repository(has_checksum: bool):
+    """Repositorio con un pool falso; information_schema indica si existe checksum"""
+    cursor = MagicMock()
+    cursor.execute = AsyncMock()
+    cursor.executemany = AsyncMock()
+    cursor.fetchone = AsyncMock(return_value=(1,) if has_checksum else None)
+    cursor.fetchall = AsyncMock(return_value=[])
+    cursor.__aenter__ = AsyncMock(return_value=cursor)
+    cursor.__aexit__ = AsyncMock(return_value=False)
+
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    conn.__aenter__ = AsyncMock(return_value=conn)
+    conn.__aexit__ = AsyncMock(return_value=False)
+
+    pool = MagicMock()
+    pool.acquire.return_value = conn
+    return OrderRepository(pool), cursor
+
+
+def _order() -> dict:
+    return {
+        'amazonOrderId': '171-0000000-0000000',
+        'orderStatus': 'Shipped',
+        'lastUpdateDate': datetime(2024, 1, 1, 12, 0),
+        'checksum': 12345,
+    }
+
+
+class OrderRepositoryChecksumTest(unittest.TestCase):
+
+    def _assert_upsert_matches(self, cursor, with_checksum: bool):
+        query, data = cursor.executemany.await_args.args
+        columns = re.search(r'INSERT INTO orders \((.*?)\)', query, re.S).group(1)
+        self.assertEqual('checksum' in columns, with_checksum)
+        self.assertEqual(query.count('%s'), len(data[0]))
+        self.assertEqual(data[0][-1] == 12345, with_checksum)
+
+    def test_upsert_without_checksum_column(self):
+        repo, cursor = _repository(has_checksum=False)
+
+        asyncio.run(repo.upsert_orders([_order()]))
+
+        self._assert_upsert_matches(cursor, with_checksum=False)
+        self.assertNotIn('checksum', cursor.executemany.await_args.args[0])
+
+    def test_upsert_with_checksum_column(self):
+        repo, cursor = _repository(has_checksum=True)
+
+        asyncio.run(repo.upsert_orders([_order()]))
+
+        self._assert_upsert_matches(cursor, with_checksum=True)
+
+    def test_status_update_without_checksum_column(self):
+        repo, cursor = _repository(has_checksum=False)
+
+        asyncio.run(repo.update_order_status_only([_order()]))
+
+        query, data = cursor.executemany.await_args.args
+        self.assertNotIn('checksum', query)
+        self.assertEqual(query.count('%s'), len(data[0]))
+
+    def test_select_returns_null_checksum_without_column(self):
+        repo, cursor = _repository(has_checksum=False)
+
+        asyncio.run(repo.get_pending_orders())
+        asyncio.run(repo.get_pending_orders())
+
+        self.assertIn('NULL AS checksum', cursor.execute.await_args.args[0])
+        # information_schema solo se consulta la primera vez
+        self.assertEqual(cursor.execute.await_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, create_autospec, patch
+
+from core.order_service import OrderExtractionService
+from infrastructure.base.async_service import AsyncService
+from infrastructure.metrics_collector import MetricsCollector
+from models.extraction_config import ExtractionConfig, ExtractType
+
+
+def _service(pipeline_results) -> OrderExtractionService:
+    """Servicio sin dependencias reales: el pipeline devuelve/lanza pipeline_results"""
+    service = OrderExtractionService.__new__(OrderExtractionService)
+    AsyncService.__init__(service)
+    service.error_handler = AsyncMock()
+    # autospec: las llamadas deben respetar la firma real de MetricsCollector
+    service.metrics = create_autospec(MetricsCollector, instance=True)
+    service._get_extraction_strategy = MagicMock()
+    service._run_pipeline = AsyncMock(side_effect=pipeline_results)
+    return service
+
+
+def _config() -> ExtractionConfig:
+    return ExtractionConfig(
+        extract_type=ExtractType.INCREMENTAL,
+        date_from=datetime(2024, 1, 1),
+        date_to=datetime(2024, 1, 2),
+        markets=['A1RKKUPIHCS9HS']
+    )
+
+
+class ExtractOrdersRetryTest(unittest.TestCase):
+
+    @patch('core.order_service.asyncio.sleep', new_callable=AsyncMock)
+    def test_transient_error_is_retried_then_succeeds(self, sleep):
+        service = _service([ConnectionError('connection reset'), 5])
+
+        result = asyncio.run(service.extract_orders(_config()))
+
+        self.assertTrue(result)
+        self.assertEqual(service._run_pipeline.await_count, 2)
+        service.error_handler.handle_error.assert_awaited_once()
+        sleep.assert_awaited_once_with(30)
+        service.metrics.record_process_success.assert_awaited_once()
+
+    @patch('core.order_service.asyncio.sleep', new_callable=AsyncMock)
+    def test_permanent_error_is_not_retried(self, sleep):
+        service = _service([ValueError('bad data')])
+
+        with self.assertRaises(ValueError):
+            asyncio.run(service.extract_orders(_config()))
+
+        self.assertEqual(service._run_pipeline.await_count, 1)
+        sleep.assert_not_awaited()
+
+    @patch('core.order_service.asyncio.sleep', new_callable=AsyncMock)
+    def test_gives_up_after_max_retries(self, sleep):
+        errors = [TimeoutError('timeout')] * OrderExtractionService.MAX_RETRIES
+        service = _service(errors)
+
+        with self.assertRaises(TimeoutError):
+            asyncio.run(service.extract_orders(_config()))
+
+        self.assertEqual(service._run_pipeline.await_count, OrderExtractionService.MAX_RETRIES)
+        self.assertEqual(sleep.await_count, OrderExtractionService.MAX_RETRIES - 1)
+
+
+class RunPipelineTest(unittest.TestCase):
+
+    def test_producer_finished_when_consumer_fails(self):
+        service = OrderExtractionService.__new__(OrderExtractionService)
+        AsyncService.__init__(service)
+        service._process_orders_batch = AsyncMock(side_effect=ValueError('bad batch'))
+
+        async def extract(config):
+            # Más lotes de los que caben en la cola: el productor queda bloqueado
+            for i in range(OrderExtractionService.PIPELINE_DEPTH * 2):
+                yield [{'amazonOrderId': str(i)}]
+
+        strategy = MagicMock()
+        strategy.extract = extract
+
+        tasks = []
+        create_task = asyncio.create_task
+
+        def track(coro):
+            tasks.append(create_task(coro))
+            return tasks[-1]
+
+        async def run():
+            with patch('core.order_service.asyncio.create_task', side_effect=track):
+                with self.assertRaises(ValueError):
+                    await service._run_pipeline(strategy, _config())
+            # Al salir, el productor ya terminó de cancelarse
+            return tasks[0].cancelled()
+
+        self.assertTrue(asyncio.run(run()))
+
+
+if __name__ == '__main__':
+    unittest.main()
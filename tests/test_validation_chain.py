@@ -0,0 +1,54 @@
+import asyncio
+import unittest
+
+import pandas as pd
+
+from infrastructure.validation.validation_chain import (
+    RemoveInternalDuplicatesRule,
+    hash_column_for,
+    hash_keys,
+)
+
+
+class RemoveInternalDuplicatesRuleTest(unittest.TestCase):
+    """RemoveInternalDuplicatesRule con Copy-on-Write activo (como en main.py)"""
+
+    def _frame(self) -> pd.DataFrame:
+        df = pd.DataFrame({
+            'unique_key': ['A|1', 'B|2', 'A|1', 'C|3', 'B|2'],
+            'value': [1, 2, 3, 4, 5],
+        })
+        df[hash_column_for('unique_key')] = hash_keys(df['unique_key'])
+        return df
+
+    def _run(self, rule: RemoveInternalDuplicatesRule, df: pd.DataFrame):
+        with pd.option_context('mode.copy_on_write', True):
+            return asyncio.run(rule.validate(df))
+
+    def test_removes_duplicates_keeping_first(self):
+        df_clean, errors = self._run(RemoveInternalDuplicatesRule(), self._frame())
+
+        self.assertEqual(df_clean['value'].tolist(), [1, 2, 4])
+        self.assertEqual(len(errors), 1)
+
+    def test_removes_duplicates_keeping_last(self):
+        df_clean, _ = self._run(RemoveInternalDuplicatesRule(keep='last'), self._frame())
+
+        self.assertEqual(df_clean['value'].tolist(), [3, 4, 5])
+
+    def test_without_hash_column(self):
+        df = self._frame().drop(columns=[hash_column_for('unique_key')])
+        df_clean, _ = self._run(RemoveInternalDuplicatesRule(), df)
+
+        self.assertEqual(df_clean['value'].tolist(), [1, 2, 4])
+
+    def test_without_duplicates(self):
+        df = self._frame().drop_duplicates('unique_key')
+        df_clean, errors = self._run(RemoveInternalDuplicatesRule(), df)
+
+        self.assertEqual(df_clean['value'].tolist(), [1, 2, 4])
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()